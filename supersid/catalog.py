@@ -0,0 +1,178 @@
+#!/usr/bin/python
+"""
+    catalog.py
+    SQLite catalog of the SID and SuperSID files found in 'data_path' and its sub-folders
+
+    Each file is read once and described by one row of the table 'files' (site, stations, frequencies, date,
+    log type, extended timestamps, log interval, number of rows, modification time) and one row per station
+    in the table 'stations' (frequency, min, max, mean). Only the files created or modified since the last
+    update are read again. The files which cannot be read are recorded in the table 'failures' with their
+    modification time and size: they are tried again only once modified.
+    Finding the files of a station or of a date range is then a query, no file is opened.
+
+    Usage as a utility:  catalog.py -c supersid.cfg [-u] [-s NWC] [--from 2015-07-01] [--to 2015-07-10]
+"""
+#   Change tracking:
+#   20261018:
+#   - first version
+from __future__ import print_function   # use the new Python 3 'print' function
+import os
+import sqlite3
+import numpy
+from sidfile import SidFile, BINARY_EXTENSION, COMPRESSION_OPENERS
+
+CATALOG_FILENAME = "catalog.sqlite"
+CATALOG_EXTENSIONS = tuple([".csv", BINARY_EXTENSION]
+                           + [".csv" + extension for extension in COMPRESSION_OPENERS])
+
+
+class SidCatalog():
+    """Index of the files of one data_path in an SQLite database"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, site TEXT, stations TEXT, frequencies TEXT, date TEXT, logtype TEXT,
+            extended INTEGER, log_interval INTEGER, nb_rows INTEGER, mtime REAL);
+        CREATE TABLE IF NOT EXISTS stations (
+            path TEXT REFERENCES files(path) ON DELETE CASCADE, station TEXT, frequency TEXT,
+            min REAL, max REAL, mean REAL, PRIMARY KEY (path, station));
+        CREATE TABLE IF NOT EXISTS failures (path TEXT PRIMARY KEY, mtime REAL, size INTEGER);
+        CREATE INDEX IF NOT EXISTS files_date ON files(date);
+        CREATE INDEX IF NOT EXISTS stations_station ON stations(station);
+    """
+
+    def __init__(self, data_path, db_filename = None):
+        """Open (create if needed) the catalog of 'data_path', by default stored in data_path/catalog.sqlite"""
+        self.version = "1.4 20261018"
+        self.data_path = data_path
+        self.db_filename = db_filename or os.path.join(data_path, CATALOG_FILENAME)
+        self.db = sqlite3.connect(self.db_filename)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SidCatalog.SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    @classmethod
+    def is_cataloged(cls, filename):
+        """Files to index: SID/SuperSID files, not the live buffer which changes at every reading"""
+        return filename.endswith(CATALOG_EXTENSIONS) and not filename.endswith("_live" + BINARY_EXTENSION)
+
+    def update(self, verbose = False):
+        """Index the new and modified files of data_path and its sub-folders, forget the deleted ones.
+        Return the number of files read."""
+        known = dict(self.db.execute("SELECT path, mtime FROM files"))
+        failed = {path: (mtime, size)
+                  for path, mtime, size in self.db.execute("SELECT path, mtime, size FROM failures")}
+        found = set()
+        nb_read = 0
+        for folder, subfolders, filenames in os.walk(self.data_path):
+            subfolders.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(folder, filename)
+                if not SidCatalog.is_cataloged(filename) or not os.path.isfile(path):
+                    continue
+                found.add(path)
+                stat = os.stat(path)
+                if known.get(path) == stat.st_mtime or failed.get(path) == (stat.st_mtime, stat.st_size):
+                    continue
+                if verbose:
+                    print("Indexing", path)
+                self.add_file(path, stat.st_mtime)
+                nb_read += 1
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in set(known) - found])
+            self.db.executemany("DELETE FROM failures WHERE path = ?", [(path,) for path in set(failed) - found])
+        return nb_read
+
+    def add_file(self, path, mtime = None):
+        """Read the file and (re)place its description in the catalog.
+        Return False if the file cannot be read: it is then recorded in 'failures'."""
+        try:
+            sid = SidFile(path)
+        except (Exception, SystemExit) as err:    # not a SID file (SidFile may exit): keep going with the other files
+            print("Warning: cannot index", path, err)
+            stat = os.stat(path)
+            with self.db:
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                self.db.execute("INSERT OR REPLACE INTO failures VALUES (?, ?, ?)",
+                                (path, mtime if mtime is not None else stat.st_mtime, stat.st_size))
+            return False
+        site = sid.sid_params.get('site_name', sid.sid_params.get('site', ''))
+        with self.db:
+            self.db.execute("DELETE FROM failures WHERE path = ?", (path,))
+            self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+            self.db.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (path, site, ",".join(sid.stations), ",".join(sid.frequencies),
+                             sid.sid_params['utc_starttime'][:10], sid.sid_params.get('logtype', ''),
+                             int(sid.is_extended), sid.LogInterval, len(sid.timestamp),
+                             mtime if mtime is not None else os.path.getmtime(path)))
+            self.db.executemany("INSERT INTO stations VALUES (?, ?, ?, ?, ?, ?)",
+                                [(path, station, frequency,
+                                  float(numpy.min(data)), float(numpy.max(data)), float(numpy.mean(data)))
+                                 for station, frequency, data in zip(sid.stations, sid.frequencies, sid.data)])
+        return True
+
+    def find(self, station = None, site = None, start_date = None, end_date = None, log_type = None):
+        """Return the paths of the files matching all the given criteria, sorted by date.
+        Dates are 'YYYY-MM-DD' strings, both included."""
+        criteria, values = [], []
+        if station:
+            criteria.append("path IN (SELECT path FROM stations WHERE station = ?)")
+            values.append(station)
+        for column, operator, value in (("site", "=", site), ("date", ">=", start_date),
+                                        ("date", "<=", end_date), ("logtype", "=", log_type)):
+            if value:
+                criteria.append("%s %s ?" % (column, operator))
+                values.append(value)
+        query = "SELECT path FROM files" + (" WHERE " + " AND ".join(criteria) if criteria else "") + " ORDER BY date, path"
+        return [row[0] for row in self.db.execute(query, values)]
+
+    def describe(self, path):
+        """Return the file's description as a dictionary with a 'stations' dictionary of station -> statistics"""
+        cursor = self.db.execute("SELECT * FROM files WHERE path = ?", (path,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        description = dict(zip([column[0] for column in cursor.description], row))
+        description['stations'] = {station: {'frequency': frequency, 'min': vmin, 'max': vmax, 'mean': vmean}
+                                   for station, frequency, vmin, vmax, vmean in
+                                   self.db.execute("SELECT station, frequency, min, max, mean FROM stations"
+                                                   " WHERE path = ?", (path,))}
+        return description
+
+
+if __name__ == '__main__':
+    import argparse
+    from config import Config
+    parser = argparse.ArgumentParser(description="Index the files of data_path and find them by station or date.")
+    parser.add_argument("-c", "--config", dest="cfg_filename", required=False, default='',
+                        help="SuperSID configuration file, for its data_path")
+    parser.add_argument("-d", "--data_path", dest="data_path", required=False,
+                        help="Folder to index, overrides the configuration file's data_path")
+    parser.add_argument("-u", "--update", action="store_true", dest="update", default=False,
+                        help="Index the new and modified files before the query")
+    parser.add_argument("-s", "--station", dest="station", help="Files recording this station")
+    parser.add_argument("--site", dest="site", help="Files of this site")
+    parser.add_argument("--from", dest="start_date", help="Files from this date YYYY-MM-DD")
+    parser.add_argument("--to", dest="end_date", help="Files up to this date YYYY-MM-DD")
+    parser.add_argument("-t", "--log_type", dest="log_type", help="Files of this log type: raw or filtered")
+    parser.add_argument("-i", "--info", action="store_true", dest="info", default=False,
+                        help="Print the description of each file found")
+    args = parser.parse_args()
+
+    data_path = args.data_path
+    if not data_path:
+        cfg = Config(args.cfg_filename or "supersid.cfg")
+        data_path = cfg.get('data_path') or Config.DATA_PATH_NAME
+    catalog = SidCatalog(os.path.expanduser(data_path))
+    if args.update:
+        print(catalog.update(verbose=True), "file(s) indexed.")
+    for path in catalog.find(args.station, args.site, args.start_date, args.end_date, args.log_type):
+        if args.info:
+            description = catalog.describe(path)
+            print(path, description['date'], description['logtype'], description['nb_rows'], "rows")
+            for station, stats in description['stations'].items():
+                print("   ", station, stats)
+        else:
+            print(path)
+    catalog.close()
@@ -30,6 +30,15 @@ CALL_SIGN, FREQUENCY, COLOR = 'call_sign', 'frequency', 'color'
 # constant for log_format
 SID_FORMAT, SUPERSID_FORMAT = 'sid_format', 'supersid_format'
 SUPERSID_EXTENDED, BOTH_EXTENDED = 'supersid_extended', 'both_extended' # with 5 decimals timestamp
+BINARY_FORMAT = 'binary_format' # memory-mappable binary file, written in addition to the CSV format
+# constant for psd_engine
+PSD_ENGINES = ('numpy', 'mlab', 'goertzel', 'zoom')
+# constant for filter_chain: filters of sidfilter.py
+FILTERS = ('min', 'average', 'bema')
+# constant for compression of the CSV files
+COMPRESSIONS = ('none', 'gz', 'bz2', 'xz')
+# constant for timer_overrun
+TIMER_OVERRUNS = ('skip', 'catchup', 'coalesce')
 
 class Config(dict):
     """Dictionary containing the key/values pair read from a .cfg file"""
@@ -70,6 +79,17 @@ class Config(dict):
                                     ('mode', str, 'Standalone'),        # Server, Client, Standalone (default)
                                     ('viewer', str, 'tk'),              # text, wx, tk (default)
                                     ('bema_wing', int, 6),              # beta_wing for sidfile.filter_buffer()
+                                    ('filter_chain', str, 'bema'),      # filters applied in sequence, e.g. min,average
+                                    ('psd_engine', str, 'numpy'),       # numpy (default), mlab, goertzel, zoom
+                                    ('zoom_bandwidth', int, 100),       # band in Hz kept around a station for psd_engine = zoom
+                                    ('zoom_measure', float, 0.0),       # band in Hz measured around a station, 0: its bin only
+                                    ('timer_overrun', str, 'coalesce'), # skip, catchup, coalesce (default): late ticks policy
+                                    ('journal', str, 'no'),             # yes/no: append every tick to a journal replayed at launch
+                                    ('journal_fsync', int, 60),         # seconds between two journal flushes to the storage
+                                    ('live_buffer', str, 'no'),         # yes/no: share the day's buffers in <site_name>_live.sidb
+                                    ('compression', str, 'none'),       # none (default), gz, bz2, xz: compress the CSV files
+                                    ('plot_cache', str, ''),            # folder caching the plots of supersid_plot, none by default
+                                    ('plot_cache_size', int, 100),      # MB: the least recently used plots are removed beyond
                                     # mandatory entries
                                     ('site_name', str, None),
                                     ('longitude', str, None),
@@ -87,7 +107,8 @@ class Config(dict):
 
                       "Capture":   (("Audio", str, 'pyaudio'),          # soundcard: alsaaudio or pyaudio ; server
                                     ("Card", str, 'External'),          # alsaaudio: card name for capture
-                                    ("PeriodSize", int, 128)            # alsaaudio: period size for capture
+                                    ("PeriodSize", int, 128),           # alsaaudio: period size for capture
+                                    ("Continuous", str, 'no')           # yes/no: background capture in a ring buffer
                                     ),
 
                       "Linux":     (("Audio", str, 'pyaudio'),          # soundcard: alsaaudio or pyaudio ; server
@@ -193,6 +214,20 @@ class Config(dict):
             self.config_err = "'hourly_save' must be either 'YES' or 'NO' in supersid.cfg. Please check."
             return
 
+        # 'journal' must be lower case yes/no
+        self['journal'] = self['journal'].lower()
+        if self['journal'] not in ('yes', 'no'):
+            self.config_ok = False
+            self.config_err = "'journal' must be either 'yes' or 'no' in supersid.cfg. Please check."
+            return
+
+        # 'live_buffer' must be lower case yes/no
+        self['live_buffer'] = self['live_buffer'].lower()
+        if self['live_buffer'] not in ('yes', 'no'):
+            self.config_ok = False
+            self.config_err = "'live_buffer' must be either 'yes' or 'no' in supersid.cfg. Please check."
+            return
+
         # log_interval should be > 2
         if self['log_interval'] <= 2:
             self.config_ok = False
@@ -200,11 +235,53 @@ class Config(dict):
             return
         
         # check log_format
-        self['log_format'] = self['log_format'].lower()
-        if self['log_format'] not in (SID_FORMAT,SUPERSID_FORMAT, SUPERSID_EXTENDED, BOTH_EXTENDED):
+        self['log_format'] = self['log_format'].lower().replace(' ', '')
+        for log_format in self['log_format'].split(','):
+            if log_format not in (SID_FORMAT,SUPERSID_FORMAT, SUPERSID_EXTENDED, BOTH_EXTENDED, BINARY_FORMAT):
+                self.config_ok = False
+                self.config_err = "'log_format' must be either 'sid_format' or 'supersid_format'/'supersid_extended', optionally followed by ',binary_format'."
+                return     
+
+        # check compression
+        self['compression'] = self['compression'].lower()
+        if self['compression'] not in COMPRESSIONS:
+            self.config_ok = False
+            self.config_err = "'compression' must be one of %s." % ", ".join(COMPRESSIONS)
+            return
+
+        # check plot_cache_size
+        if self['plot_cache_size'] <= 0:
+            self.config_ok = False
+            self.config_err = "'plot_cache_size' must be a positive number of MB."
+            return
+
+        # check filter_chain: comma separated filter names
+        self['filter_chain'] = self['filter_chain'].lower().replace(' ', '')
+        for filter_name in self['filter_chain'].split(','):
+            if filter_name not in FILTERS:
+                self.config_ok = False
+                self.config_err = "'filter_chain' must be a comma separated list of %s." % ", ".join(FILTERS)
+                return
+
+        # check timer_overrun
+        self['timer_overrun'] = self['timer_overrun'].lower()
+        if self['timer_overrun'] not in TIMER_OVERRUNS:
+            self.config_ok = False
+            self.config_err = "'timer_overrun' must be one of %s." % ", ".join(TIMER_OVERRUNS)
+            return
+
+        # check zoom_measure: a few Hz at most to keep the sub-Hz resolution
+        if not 0.0 <= self['zoom_measure'] <= 5.0:
             self.config_ok = False
-            self.config_err = "'log_format' must be either 'sid_format' or 'supersid_format'/'supersid_extended'."
-            return     
+            self.config_err = "'zoom_measure' must be between 0 and 5 Hz."
+            return
+
+        # check psd_engine
+        self['psd_engine'] = self['psd_engine'].lower()
+        if self['psd_engine'] not in PSD_ENGINES:
+            self.config_ok = False
+            self.config_err = "'psd_engine' must be one of %s." % ", ".join(PSD_ENGINES)
+            return
 
         # Check the 'data_path' validity and create it as a Config instance property
         self.data_path = os.path.normpath(self['data_path'] or Config.DATA_PATH_NAME) + os.sep
@@ -217,6 +294,13 @@ class Config(dict):
         if "Audio" not in self:
             self["Audio"] = "pyaudio"
 
+        # 'Continuous' capture must be lower case yes/no, default to no if not declared
+        self["Continuous"] = self.get("Continuous", "no").lower()
+        if self["Continuous"] not in ('yes', 'no'):
+            self.config_ok = False
+            self.config_err = "'Continuous' must be either 'yes' or 'no' in the [Capture] section. Please check."
+            return
+
         # Just one choice: 'plot_offset = 0', for now ; not in the expected parameters list
         self['plot_offset'] = 0
 
@@ -28,7 +28,7 @@ import argparse
 from os import path
 import ftplib
 from datetime import datetime, timedelta
-from sidfile import SidFile
+from sidfile import SidFile, find_sid_file
 from config import Config, FILTERED, RAW
 
 def exist_file(x):
@@ -54,8 +54,8 @@ if __name__ == '__main__':
     # file list
     if args.askYesterday:
         yesterday = datetime.utcnow() - timedelta(days=1)
-        file_list.append("{}{}{}_{}-{:02d}-{:02d}.csv".format(cfg['data_path'], path.sep, cfg['site_name'],
-                                                       yesterday.year,yesterday.month,yesterday.day))
+        file_list.append(find_sid_file("{}{}{}_{}-{:02d}-{:02d}.csv".format(cfg['data_path'], path.sep, cfg['site_name'],
+                                                       yesterday.year,yesterday.month,yesterday.day)))
     # generate all the SID files ready to send in the local_tmp file
     files_to_send = []
     for input_file in file_list:
@@ -80,13 +80,15 @@ if __name__ == '__main__':
                 if factor > 1:
                     iStation = sid.get_station_index(station_name)
                     sid.data[iStation] *= factor
+                    sid.data_changed()
                 # generate the SID file of that station
                 # UTC_StartTime = 2014-05-31 00:00:00
                 file_startdate = sid.sid_params['utc_starttime']
                 file_name = "{}{}{}_{}_{}.csv".format(cfg['local_tmp'] or cfg["data_path"], path.sep,
                                                      cfg['site_name'], station_name, file_startdate[:10])
                 # if the original file is filtered then we can save it "as is" else we need to apply_bema i.e. filter it
-                sid.write_data_sid(station_name, file_name, FILTERED, extended = False, apply_bema = sid.sid_params['logtype'] == RAW)
+                sid.write_data_sid(station_name, file_name, FILTERED, extended = False, apply_bema = sid.sid_params['logtype'] == RAW,
+                                   bema_wing = cfg['bema_wing'], filter_chain = cfg['filter_chain'])
                 files_to_send.append(file_name)
 
         else:
@@ -0,0 +1,148 @@
+"""
+    journal.py
+    Append-only tick journal: every tick's (index, timestamp, strengths) record is appended to the
+    day's journal file as soon as it is captured. At launch, the journal of the current day is replayed
+    in the Logger's buffers: a restart, even after a crash, does not lose the day's data.
+    The journals of the previous days, left by a process stopped before midnight, are saved in their day's files
+    by the Logger then deleted.
+
+    Compared with 'hourly_save', one tick costs a few bytes written instead of a full day file
+    rewritten every hour.
+
+    File format:
+    - header: magic, number of stations, log_interval, UTC start time (us since epoch), stations length
+      followed by the comma separated station call signs
+    - records: index (int32), timestamp (int64, us since epoch), one float64 strength per station:
+      the replayed strengths are the ones captured
+    A record truncated by a crash is ignored at replay and overwritten by the next append.
+"""
+#   Change tracking:
+#   20261018:
+#   - first version
+from __future__ import print_function   # use the new Python 3 'print' function
+import os
+import struct
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic   # Python 2.7
+import numpy
+
+JOURNAL_HEADER = struct.Struct("<8sIIqI")
+JOURNAL_MAGIC = b"SIDJRNL2"
+JOURNAL_EXTENSION = ".journal"
+
+
+def record_dtype(nb_stations):
+    return numpy.dtype([('index', '<i4'), ('timestamp', '<i8'), ('strengths', '<f8', (nb_stations,))])
+
+
+def read_journal(filename):
+    """Return (stations, log_interval, start as datetime64[us], records) of the journal file, None if it is not one.
+    A record truncated by a crash is ignored."""
+    with open(filename, "rb") as fin:
+        preamble = fin.read(JOURNAL_HEADER.size)
+        if len(preamble) < JOURNAL_HEADER.size:
+            return None
+        magic, nb_stations, log_interval, start_us, length = JOURNAL_HEADER.unpack(preamble)
+        if magic != JOURNAL_MAGIC:
+            return None
+        stations = fin.read(length).decode('utf-8').split(",")
+        dtype = record_dtype(nb_stations)
+        nb_records = (os.path.getsize(filename) - JOURNAL_HEADER.size - length) // dtype.itemsize
+        records = numpy.fromfile(fin, dtype=dtype, count=nb_records)
+    return stations, log_interval, numpy.datetime64(start_us, 'us'), records
+
+
+def replay_records(records, sid_file):
+    """Copy the records in the buffers of 'sid_file' and return the number of records copied"""
+    records = records[(records['index'] >= 0) & (records['index'] < sid_file.data.shape[1])]
+    sid_file.data[:, records['index']] = records['strengths'].T
+    sid_file.timestamp[records['index']] = records['timestamp'].astype('datetime64[us]')
+    return len(records)
+
+
+class TickJournal():
+    """Write-ahead journal of the ticks of one day, flushed to the OS at every tick and
+    fsync'ed to the storage every 'fsync_interval' seconds."""
+    def __init__(self, filename, stations, start_time, log_interval, fsync_interval = 60):
+        """Open the journal 'filename' for the 'stations' list of call signs, day starting at 'start_time' (a datetime).
+        An existing journal of the same day and stations is kept for 'replay' else it is started anew."""
+        self.version = "1.4 20261018"
+        self.filename = filename
+        self.stations = list(stations)
+        self.log_interval = log_interval
+        self.fsync_interval = fsync_interval
+        self.start_us = int(numpy.datetime64(start_time, 'us').astype('int64'))
+        self.record = struct.Struct("<iq%dd" % len(self.stations))
+        self.header = self.build_header()
+        self.last_sync = monotonic()
+        self.nb_records = self.read_nb_records()
+        if self.nb_records is None:  # no journal or another day's or stations': start a new one
+            self.nb_records = 0
+            with open(self.filename, "wb") as fout:
+                fout.write(self.header)
+        # drop a truncated record before appending
+        with open(self.filename, "r+b") as fout:
+            fout.truncate(len(self.header) + self.nb_records * self.record.size)
+        self.fout = open(self.filename, "ab")
+
+    def build_header(self):
+        stations = ",".join(self.stations).encode('utf-8')
+        return JOURNAL_HEADER.pack(JOURNAL_MAGIC, len(self.stations), self.log_interval,
+                                   self.start_us, len(stations)) + stations
+
+    def read_nb_records(self):
+        """Return the number of complete records of the existing journal, None if it does not match this day and stations"""
+        try:
+            with open(self.filename, "rb") as fin:
+                if fin.read(len(self.header)) != self.header:
+                    print("Journal", self.filename, "is for another day or other stations: restart it.")
+                    return None
+                fin.seek(0, os.SEEK_END)
+                return (fin.tell() - len(self.header)) // self.record.size
+        except IOError:
+            return None
+
+    def replay(self, sid_file):
+        """Copy the journal's records in the buffers of 'sid_file' and return the number of records replayed"""
+        if self.nb_records == 0:
+            return 0
+        return replay_records(read_journal(self.filename)[3][:self.nb_records], sid_file)
+
+    def append(self, index, utc_now, strengths):
+        """Append the record of one tick"""
+        timestamp = int(numpy.datetime64(utc_now, 'us').astype('int64'))
+        self.fout.write(self.record.pack(index, timestamp, *strengths))
+        self.fout.flush()   # in the OS cache: safe if the process crashes
+        self.nb_records += 1
+        if monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """Force the journal to the storage: safe if the power is lost"""
+        os.fsync(self.fout.fileno())
+        self.last_sync = monotonic()
+
+    def close(self):
+        if not self.fout.closed:
+            self.sync()
+            self.fout.close()
+
+    def remove(self):
+        """Close and delete the journal once its day is saved"""
+        self.close()
+        os.remove(self.filename)
+
+
+if __name__ == '__main__':
+    import sys
+    # one argument: the journal file to dump
+    journal = read_journal(sys.argv[1])
+    if journal is None:
+        print(sys.argv[1], "is not a journal file.")
+        sys.exit(1)
+    stations, log_interval, start, records = journal
+    print("Day", start, "stations", stations, "log_interval", log_interval)
+    for record in records:
+        print(record['index'], record['timestamp'].astype('datetime64[us]'), record['strengths'])
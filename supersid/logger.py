@@ -9,16 +9,59 @@
 #   - fix 'raw_input' to ensure code works on both Python 2 and 3
 #   20150801:
 #   - truncate sid_params['utc_starttime'] to 19 first chars
+#   20261018:
+#   - background writer thread for snapshots of the buffers
+#   - tick journal replayed at launch (optional, 'journal = yes')
+#   - buffers shared with other processes in a live binary file (optional, 'live_buffer = yes')
+#   - online filtering of the buffers
+#   - compressed CSV files (optional, 'compression = gz|bz2|xz')
 from __future__ import print_function   # use the new Python 3 'print' function
+import os
 from os import path
+import glob
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None  # Python 2.7 without the 'futures' backport: files written in the caller's thread
 try:
     input = raw_input  # this is Python 2 raw_input now to be used like input in Python 3
 except NameError:
     pass    # already Python 3
 from time import gmtime, strftime
 
-from sidfile import SidFile
-from config import FILTERED, RAW, CALL_SIGN, FREQUENCY, SID_FORMAT, SUPERSID_FORMAT
+from sidfile import SidFile, COMPRESSION_OPENERS
+from journal import TickJournal, JOURNAL_EXTENSION, read_journal, replay_records
+from config import FILTERED, RAW, CALL_SIGN, FREQUENCY, SID_FORMAT, SUPERSID_FORMAT, BINARY_FORMAT
+
+class DoneFuture():
+    """Result of a task already performed, with the methods of a concurrent.futures.Future used by the Logger"""
+    def __init__(self, function, *args):
+        self._result, self._exception = None, None
+        try:
+            self._result = function(*args)
+        except Exception as err:
+            self._exception = err
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        return self._exception
+
+    def add_done_callback(self, callback):
+        callback(self)
+
+
+class SerialWriter():
+    """Writer performing each task at once, when the background writer thread is not available"""
+    def submit(self, function, *args):
+        return DoneFuture(function, *args)
+
+    def shutdown(self, wait = True):
+        pass
+
 
 class Logger():
     """
@@ -32,9 +75,14 @@ class Logger():
         :param read_file: optional file to read in memory at launch if given by user on the command line
         :return: nothing but self
         """
-        self.version = "1.4 20150801"
+        self.version = "1.4 20261018"
         self.controller = controller
         self.config = controller.config
+        # background writer: disk I/O off the tick path
+        self.writer = ThreadPoolExecutor(max_workers=1) if ThreadPoolExecutor else SerialWriter()
+        # extension added to the CSV file names to compress them
+        self.compression = "" if self.config['compression'] == 'none' else "." + self.config['compression']
+        binary_format = BINARY_FORMAT in self.config['log_format'].split(',')
         # first create in memory buffers
         if len(self.config.stations) == 1:
             # only one station to monitor, let's default to SID file format
@@ -51,7 +99,12 @@ class Logger():
         else:
             print("Error: no station to log???")
             exit(5)
+        if binary_format:  # the binary file is written in addition to the CSV file(s)
+            self.config['log_format'] += ',' + BINARY_FORMAT
         self.sid_file = SidFile(sid_params = self.config)
+        # filtered buffers updated at each reading: filtered files are a copy, no filtering at save time
+        self.sid_file.enable_online_filter(self.config['bema_wing'], self.config['filter_chain'])
+        self.journal = None
 
         # Do we have a file to read? i.e. file path given on the command line by the user at launch
         if read_file:
@@ -77,19 +130,149 @@ class Logger():
             self.sid_file.copy_data(sid_file2)
             print("Continue recording with data from file", read_file, "included.")
 
-    def log_sid_format(self, stations,  filename='', log_type=FILTERED, extended = False):
+        # save the days left in journals by a stop before midnight, replay today's journal then keep appending to it
+        if self.config['journal'] == 'yes':
+            self.recover_journals()
+            self.open_journal()
+
+        # share the buffers: plots and other processes read them without any save
+        if self.config['live_buffer'] == 'yes':
+            self.sid_file.share_live_buffer(self.config.data_path + self.sid_file.get_live_filename())
+
+    def journal_filename(self, sid_file):
+        return self.config.data_path + sid_file.get_supersid_filename()[:-4] + JOURNAL_EXTENSION
+
+    def recover_journals(self):
+        """Save the day of each journal of this site older than today in its files, then delete the journal.
+        A journal which cannot be saved is kept and tried again at the next launch."""
+        today_journal = self.journal_filename(self.sid_file)
+        site_pattern = self.sid_file.get_supersid_filename()[:-14] + "????-??-??" + JOURNAL_EXTENSION
+        frequencies = dict((station[CALL_SIGN], station[FREQUENCY]) for station in self.config.stations)
+        for filename in sorted(glob.glob(self.config.data_path + site_pattern)):
+            if filename == today_journal:
+                continue
+            journal = read_journal(filename)
+            if journal is None:
+                print("Journal", filename, "is not readable: kept.")
+                continue
+            stations, log_interval, start, records = journal
+            sid_params = dict(self.sid_file.sid_params)
+            for key in ('stations', 'frequencies', 'stationid', 'frequency'):
+                sid_params.pop(key, None)
+            if len(stations) > 1:
+                sid_params['stations'] = ",".join(stations)
+                sid_params['frequencies'] = ",".join(frequencies.get(station, '0') for station in stations)
+            else:
+                sid_params['stationid'], sid_params['frequency'] = stations[0], frequencies.get(stations[0], '0')
+            sid_params['utc_starttime'] = str(start.astype('datetime64[D]')) + " 00:00:00"
+            sid_params['log_interval'] = log_interval
+            sid_file = SidFile(sid_params = sid_params)
+            nb_records = replay_records(records, sid_file)
+            day_stations = [{CALL_SIGN: station, FREQUENCY: frequencies.get(station, '0')} for station in stations]
+            try:
+                filenames = []
+                for log_format in self.config['log_format'].split(','):
+                    filenames += self.save_buffers(day_stations, log_type=self.config['log_type'],
+                                                   log_format=log_format, sid_file=sid_file)
+            except (IOError, OSError) as err:
+                print("Journal", filename, "kept: the day could not be saved.", err)
+                continue
+            os.remove(filename)
+            print(nb_records, "records of journal", filename, "saved in", ", ".join(filenames))
+
+    def open_journal(self):
+        """Open the journal of the day of self.sid_file and replay its records in the buffers"""
+        filename = self.journal_filename(self.sid_file)
+        self.journal = TickJournal(filename, self.sid_file.stations, self.sid_file.startTime,
+                                   self.sid_file.LogInterval, fsync_interval=self.config['journal_fsync'])
+        nb_records = self.journal.replay(self.sid_file)
+        if nb_records:
+            self.sid_file.refresh_filtered()
+            print("Continue recording with", nb_records, "records replayed from journal", filename)
+
+    def rotate_journal(self, futures):
+        """Start the journal of the new day. The previous journal is deleted by the background writer
+        once all 'futures', the saves of the previous day, succeeded."""
+        previous_journal = self.journal
+        self.open_journal()
+        self.writer.submit(self.retire_journal, previous_journal, futures)
+
+    def retire_journal(self, journal, futures):
+        # the writer runs its tasks in order: the saves are done
+        if all(future.exception() is None for future in futures):
+            journal.remove()
+        else:
+            journal.close()
+            print("Journal", journal.filename, "kept: the day could not be saved.")
+
+    def compressed(self, filename):
+        """Return the file name with the compression's extension, if not already given"""
+        if path.splitext(filename)[1].lower() in COMPRESSION_OPENERS:
+            return filename
+        return filename + self.compression
+
+    def log_sid_format(self, stations,  filename='', log_type=FILTERED, extended = False, sid_file = None):
         """ One file per station. By default, buffered data is filtered."""
+        sid_file = sid_file or self.sid_file
         filenames = []
         for station in stations:       
-            my_filename = self.config.data_path + (filename or self.sid_file.get_sid_filename(station['call_sign']))
+            my_filename = self.compressed(self.config.data_path + (filename or sid_file.get_sid_filename(station['call_sign'])))
             filenames.append(my_filename)
-            self.sid_file.write_data_sid(station, my_filename, log_type, extended=extended, bema_wing=self.config["bema_wing"])
+            sid_file.write_data_sid(station, my_filename, log_type, extended=extended, bema_wing=self.config["bema_wing"],
+                                    filter_chain=self.config["filter_chain"])
         return filenames
     
-    def log_supersid_format(self, stations, filename='', log_type=FILTERED, extended = False):
+    def log_supersid_format(self, stations, filename='', log_type=FILTERED, extended = False, sid_file = None):
         """Cascade all buffers in one file."""
+        sid_file = sid_file or self.sid_file
         my_filename = filename if filename and path.isabs(filename) \
-                      else self.config.data_path + (filename or self.sid_file.get_supersid_filename())
-        self.sid_file.write_data_supersid(my_filename, log_type, extended=extended, bema_wing=self.config["bema_wing"])
+                      else self.config.data_path + (filename or sid_file.get_supersid_filename())
+        my_filename = self.compressed(my_filename)
+        sid_file.write_data_supersid(my_filename, log_type, extended=extended, bema_wing=self.config["bema_wing"],
+                                     filter_chain=self.config["filter_chain"])
         return [my_filename]
-    
+
+    def log_binary_format(self, stations, filename='', log_type=FILTERED, sid_file = None):
+        """All buffers in one binary file, memory-mappable for fast reading."""
+        sid_file = sid_file or self.sid_file
+        my_filename = filename if filename and path.isabs(filename) \
+                      else self.config.data_path + (filename or sid_file.get_binary_filename())
+        sid_file.write_data_binary(my_filename, log_type, bema_wing=self.config["bema_wing"],
+                                   filter_chain=self.config["filter_chain"])
+        return [my_filename]
+
+    def save_buffers(self, stations, filename='', log_type=RAW, log_format='both', sid_file=None):
+        """ Save the buffers of 'sid_file' (default: the live self.sid_file) and return the list of file names
+
+            log_type = raw or filtered
+            log_format = sid_format|sid_extended|supersid_format|supersid_extended|both|both_extended|binary_format"""
+        filenames = []
+        if log_format.startswith('both') or log_format.startswith('sid'):
+            # filename is '' to ensure one file per station
+            filenames += self.log_sid_format(stations, '', log_type=log_type,
+                                             extended=log_format.endswith('extended'), sid_file=sid_file)
+        if log_format.startswith('both') or log_format.startswith('supersid'):
+            filenames += self.log_supersid_format(stations, filename, log_type=log_type,
+                                                  extended=log_format.endswith('extended'), sid_file=sid_file)
+        if log_format.startswith('binary'):
+            filenames += self.log_binary_format(stations, filename, log_type=log_type, sid_file=sid_file)
+        return filenames
+
+    def save_buffers_async(self, sid_file, stations, filename='', log_type=RAW, log_format='both'):
+        """Filter and write 'sid_file', a snapshot of the buffers, in the background writer thread.
+        Return a Future giving the list of file names."""
+        future = self.writer.submit(self.save_buffers, stations, filename, log_type, log_format, sid_file)
+        future.add_done_callback(self.on_saved)
+        return future
+
+    def on_saved(self, future):
+        """Report the background writer's failure: nobody might wait for the Future's result"""
+        if future.exception() is not None:
+            print("Error saving buffers:", future.exception())
+
+    def close(self):
+        """Wait for the pending background writes"""
+        self.writer.shutdown(wait=True)
+        self.sid_file.close_live_buffer()
+        if self.journal:
+            self.journal.close()
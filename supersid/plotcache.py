@@ -0,0 +1,119 @@
+"""
+    plotcache.py
+    Cache of the rendered plots (PDF/PNG) and of the decimated curves, in a folder limited in size
+
+    The key of an entry is made of the input files (path, modification time and size) and of the options
+    changing the output (stations, NOAA flares, size, decimation...): a file modified or a different option
+    gives a new key, the old entries are never read again and are evicted when the folder exceeds its budget,
+    the least recently used first.
+"""
+#   Change tracking:
+#   20261018:
+#   - first version
+from __future__ import print_function   # use the new Python 3 'print' function
+import os
+import shutil
+import hashlib
+import json
+import zipfile
+import numpy
+from sidfile import write_sidecar
+from sidpyramid import plot_series
+
+
+class PlotCache():
+    """Folder of rendered plots and decimated curves, evicted by LRU beyond 'budget' bytes"""
+    def __init__(self, cache_path, budget = 100 * 1024 * 1024):
+        self.version = "1.4 20261018"
+        self.cache_path = os.path.expanduser(cache_path)
+        self.budget = budget
+        if not os.path.isdir(self.cache_path):
+            os.makedirs(self.cache_path)
+
+    @classmethod
+    def make_key(cls, filenames, **options):
+        """Return the key of the output of 'filenames' rendered with 'options' (values printable by str)"""
+        files = []
+        for filename in sorted(filenames):
+            stat = os.stat(filename)
+            files.append((os.path.abspath(filename), stat.st_mtime, stat.st_size))
+        description = json.dumps([files, sorted((name, str(value)) for name, value in options.items())])
+        return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+    def entry_filename(self, key, extension):
+        return os.path.join(self.cache_path, key + extension)
+
+    def get(self, key, extension):
+        """Return the file name of the cached entry, None if not cached"""
+        filename = self.entry_filename(key, extension)
+        try:
+            os.utime(filename, None)  # most recently used
+        except OSError:  # not cached, or evicted meanwhile by another process
+            return None
+        return filename
+
+    def fetch(self, key, extension, destination):
+        """Copy the cached entry to 'destination' and return True, False if not cached"""
+        filename = self.get(key, extension)
+        if filename is None:
+            return False
+        try:
+            shutil.copyfile(filename, destination)
+        except (IOError, OSError):  # evicted meanwhile: a cache miss
+            return False
+        return True
+
+    def put(self, key, extension, source):
+        """Copy the rendered file 'source' in the cache: the entry appears complete or not at all"""
+        with open(source, "rb") as fin:
+            write_sidecar(self.entry_filename(key, extension), lambda fout: shutil.copyfileobj(fin, fout))
+        self.evict()
+
+    def get_series(self, key):
+        """Return the cached (x, y) curve, None if not cached"""
+        filename = self.get(key, ".npz")
+        if filename is None:
+            return None
+        try:
+            with numpy.load(filename) as npz:
+                return npz['x'], npz['y']
+        except (IOError, OSError, ValueError, zipfile.BadZipfile):  # evicted meanwhile or unreadable: a cache miss
+            return None
+
+    def put_series(self, key, x, y):
+        """Store the (x, y) curve in the cache: the entry appears complete or not at all"""
+        write_sidecar(self.entry_filename(key, ".npz"), lambda fout: numpy.savez(fout, x=x, y=y))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in its budget"""
+        entries = []
+        for name in os.listdir(self.cache_path):
+            filename = os.path.join(self.cache_path, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:  # removed meanwhile by another thread or process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, filename in sorted(entries):
+            if size <= self.budget:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            size -= entry_size
+
+    def cached_plot_series(self, sid_file, station, nb_pixels, decimation = 'minmax', time_range = None):
+        """sidpyramid.plot_series() computed once per file, station and options.
+        A live buffer changes at every reading: never cached."""
+        if sid_file.is_live or not sid_file.filename:
+            return plot_series(sid_file, station, nb_pixels, decimation)
+        key = PlotCache.make_key([sid_file.filename], station=station, nb_pixels=nb_pixels, decimation=decimation,
+                                 time_range=time_range)
+        series = self.get_series(key)
+        if series is None:
+            series = plot_series(sid_file, station, nb_pixels, decimation)
+            self.put_series(key, *series)
+        return series
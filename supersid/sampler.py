@@ -16,12 +16,18 @@
      - __init__: open the 'device' for future capture
      - capture_1sec: obtain one second of sound and return as an array of 'audio_sampling_rate' integers
      - close: close the 'device'
+
+    In continuous mode ([Capture] Continuous = yes), a background thread reads the 'device' all the time
+    and fills a preallocated CaptureRingBuffer. Each tick then gets a view on the latest 'log_interval'
+    seconds of sound instead of waiting for a fresh 1 second capture.
 """
 # 20150801:
 #   - modify the __main__ to help debugging the soundcard
 from __future__ import print_function   # use the new Python 3 'print' function
 from struct import unpack as st_unpack
-from numpy import array
+import threading
+import time
+from numpy import array, zeros
 
 audioModule=[]
 try:
@@ -46,10 +52,14 @@ try:
             self.name = "alsaaudio sound card capture on " + card
 
         def capture_1sec(self):
-            raw_data = b''
-            while len(raw_data) < 2 * self.audio_sampling_rate:
+            # collect the periods in a list and join once: growing a bytes string period after period is quadratic
+            periods, nb_bytes = [], 0
+            while nb_bytes < 2 * self.audio_sampling_rate:
                 length,data = self.inp.read()
-                if length> 0: raw_data += data
+                if length> 0:
+                    periods.append(data)
+                    nb_bytes += len(data)
+            raw_data = b''.join(periods)
             return array(st_unpack("%ih"%self.audio_sampling_rate, raw_data[:2 * self.audio_sampling_rate]))
         
         def close(self):
@@ -161,6 +171,103 @@ except ImportError:
     pass
 
 
+class CaptureRingBuffer():
+    """Preallocated ring buffer continuously filled by a background thread reading the capture device.
+    Every chunk is written twice, at 'pos' and at 'pos + size', so that the latest N samples
+    are always available as one contiguous numpy view: no copy is needed to read them.
+    A failing device is retried with a growing delay, up to MAX_RETRY_DELAY seconds, and is declared
+    'failed' after MAX_CONSECUTIVE_ERRORS errors in a row, until it captures again.
+    """
+    MAX_CONSECUTIVE_ERRORS = 10
+    MAX_RETRY_DELAY = 5.0
+
+    def __init__(self, capture_device, audio_sampling_rate, seconds, scaling_factor = 1.0):
+        self.capture_device = capture_device
+        self.size = int(seconds * audio_sampling_rate)
+        self.buffer = zeros(2 * self.size)
+        self.scaling_factor = scaling_factor
+        self.write_pos = 0      # position of the next sample to write in [0, size[
+        self.nb_samples = 0     # number of samples written since the start, saturates at 'size'
+        self.nb_errors = 0      # total number of capture errors
+        self.consecutive_errors = 0
+        self.failed = False     # True after MAX_CONSECUTIVE_ERRORS errors in a row
+        self.filled = threading.Condition()  # notified each time samples are written
+        self.running = False
+        self.thread = threading.Thread(target=self.run, name="CaptureRingBuffer")
+        self.thread.daemon = True
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def run(self):
+        """Background loop: read the device one second at a time and store the sound in the buffer"""
+        while self.running:
+            try:
+                chunk = self.capture_device.capture_1sec()
+            except Exception as err:
+                self.nb_errors += 1
+                self.consecutive_errors += 1
+                if self.consecutive_errors == 1 or self.consecutive_errors == self.MAX_CONSECUTIVE_ERRORS:
+                    print("Fail to read data from audio using", self.capture_device.name, err)
+                if self.consecutive_errors >= self.MAX_CONSECUTIVE_ERRORS and not self.failed:
+                    self.failed = True
+                    print("Capture device failed", self.consecutive_errors, "times in a row: still retrying.")
+                # back off: a dead or unplugged device must not spin a core
+                time.sleep(min(0.1 * 2 ** min(self.consecutive_errors, 10), self.MAX_RETRY_DELAY))
+                continue
+            if self.consecutive_errors:
+                print("Capture device", self.capture_device.name, "works again.")
+            self.consecutive_errors, self.failed = 0, False
+            self.write(chunk)
+
+    def write(self, chunk):
+        """Copy the chunk at the write position, in both halves of the buffer"""
+        nb = len(chunk)
+        if nb == 0:
+            return
+        if nb > self.size:
+            chunk, nb = chunk[-self.size:], self.size
+        if self.scaling_factor != 1.0:
+            chunk = chunk * self.scaling_factor
+        pos, end = self.write_pos, self.write_pos + nb
+        if end <= self.size:
+            self.buffer[pos:end] = chunk
+            self.buffer[pos + self.size:end + self.size] = chunk
+        else:  # the chunk wraps around the end of the ring
+            split = self.size - pos
+            self.buffer[pos:self.size] = chunk[:split]
+            self.buffer[pos + self.size:] = chunk[:split]
+            self.buffer[:nb - split] = chunk[split:]
+            self.buffer[self.size:self.size + nb - split] = chunk[split:]
+        with self.filled:
+            self.write_pos = end % self.size
+            self.nb_samples = min(self.nb_samples + nb, self.size)
+            self.filled.notify_all()
+
+    def wait_samples(self, nb_samples, timeout):
+        """Wait until at least 'nb_samples' are captured, return False after 'timeout' seconds"""
+        deadline = time.time() + timeout
+        with self.filled:   # no Condition.wait_for() in Python 2.7
+            while self.nb_samples < min(nb_samples, self.size):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.filled.wait(remaining)
+            return True
+
+    def latest(self, nb_samples):
+        """Return a view (no copy) on the latest 'nb_samples' captured, fewer if the buffer is not filled yet"""
+        nb_samples = min(nb_samples, self.nb_samples)
+        end = self.write_pos + self.size
+        return self.buffer[end - nb_samples:end]
+
+    def stop(self):
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join(2.0)  # the capture device returns within one second
+
+
 class Sampler():
     """Sampler will gather sound capture from various devices: sound cards or remote server"""
     def __init__(self, controller, audio_sampling_rate = 96000, NFFT = 1024):
@@ -171,6 +278,7 @@ class Sampler():
         self.audio_sampling_rate = audio_sampling_rate
         self.NFFT = NFFT
         self.sampler_ok = True
+        self.ring_buffer = None
 
         try:
             if controller.config['Audio'] == 'pyaudio':
@@ -193,9 +301,17 @@ class Sampler():
 
         if self.sampler_ok:
             print("-", self.capture_device.name)
+            if controller.config.get('Continuous', 'no').lower() == 'yes':
+                # keep 2 extra seconds in the ring so the view given to a tick is not overwritten while in use
+                self.window = controller.config['log_interval'] * audio_sampling_rate
+                self.ring_buffer = CaptureRingBuffer(self.capture_device, audio_sampling_rate,
+                                                     controller.config['log_interval'] + 2, self.scaling_factor)
+                self.ring_buffer.start()
+                print("- continuous capture in a %d seconds ring buffer" % (controller.config['log_interval'] + 2))
 
     def set_monitored_frequencies(self, stations):
         self.monitored_bins = []
+        self.monitored_frequencies = [int(station['frequency']) for station in stations]  # for narrowband engines
         for station in stations:
             binSample = int(((int(station['frequency']) * self.NFFT) / self.audio_sampling_rate))
             self.monitored_bins.append(binSample)
@@ -217,7 +333,24 @@ class Sampler():
                 
         return self.data
 
+    def capture(self):
+        """Return the latest sound samples: the whole 'log_interval' window in continuous mode, else 1 second.
+        Continuous mode: wait for the first full window after the start ; if the device fails then
+        'sampler_ok' is cleared and an empty array is returned."""
+        if self.ring_buffer is None:
+            return self.capture_1sec()
+        window_seconds = self.window / self.audio_sampling_rate
+        if not self.ring_buffer.wait_samples(self.window, window_seconds + 2):
+            print("Sampler not ready: less than", window_seconds, "seconds of sound captured.")
+            self.data = zeros(0)
+        else:
+            self.data = self.ring_buffer.latest(self.window)
+        self.sampler_ok = not self.ring_buffer.failed
+        return self.data
+
     def close(self):
+        if self.ring_buffer:
+            self.ring_buffer.stop()
         self.capture_device.close()
 
     def display_error_message(self, message):
@@ -0,0 +1,182 @@
+#!/usr/bin/python
+"""
+    siddataset.py
+    Multi-file dataset: the readings of some stations over a time range, stitched across the daily files
+
+    SidDataset finds the files of a folder (with its catalog.sqlite if present, else by reading their headers)
+    and returns one array per station on a common regular time grid, the missing readings set to NaN.
+    For each day and station, only one file is read: the requested log type (else filtered rather than raw),
+    a daily file rather than the hourly_current_buffers, a binary file rather than a CSV.
+    Only the rows of the range are read (see SidFile.slice: the hours needed of a CSV file, a view of a binary file)
+    and kept in a LRU cache within a memory budget, by file and range within the file's day: moving or zooming
+    a multi-week window reads only the days entering it and the hours needed at its ends.
+    supersid_plot.py uses the dataset to find the files of a time range; the plots themselves are still drawn
+    file by file, from each file's pyramid (see sidpyramid.py).
+"""
+#   Change tracking:
+#   20261018:
+#   - first version
+from __future__ import print_function   # use the new Python 3 'print' function
+import os
+from collections import OrderedDict
+import numpy
+from sidfile import SidFile, BINARY_EXTENSION
+from catalog import SidCatalog, CATALOG_FILENAME
+from config import FILTERED, RAW
+
+LOG_TYPE_PREFERENCE = (FILTERED, RAW)    # without 'log_type', the first log type found for a day wins
+HOURLY_PREFIX = "hourly_current_buffers"
+
+
+class SidDataset():
+    """Stations' readings over any time range, read from the SID/SuperSID files of a folder"""
+    def __init__(self, source, memory_budget = 256 * 1024 * 1024, log_type = None):
+        """'source' is a folder, a SidCatalog or a list (or comma separated string) of file names.
+        'memory_budget' in bytes limits the files kept in memory.
+        'log_type' (raw or filtered) keeps only the files of that type."""
+        self.version = "1.4 20261018"
+        self.memory_budget = memory_budget
+        self.log_type = log_type
+        self.catalog, self.filenames = None, []
+        if isinstance(source, SidCatalog):
+            self.catalog = source
+        elif isinstance(source, str) and os.path.isdir(source):
+            if os.path.isfile(os.path.join(source, CATALOG_FILENAME)):
+                self.catalog = SidCatalog(source)
+                self.catalog.update()
+            else:
+                self.filenames = [os.path.join(source, filename) for filename in sorted(os.listdir(source))
+                                  if SidCatalog.is_cataloged(filename)]
+        elif isinstance(source, str):
+            self.filenames = [filename.strip() for filename in source.split(",") if filename.strip()]
+        else:
+            self.filenames = list(source)
+        self.headers = {}          # file name -> lazy SidFile: header only
+        self.cache = OrderedDict()  # (file name, start, end) -> SidFile of those readings, most recently used last
+        self.cache_size = 0
+
+    def get_header(self, filename):
+        """Return the SidFile of the file, header only, None if it is not a SID file"""
+        if filename not in self.headers:
+            try:
+                self.headers[filename] = SidFile(filename, lazy = True)
+            except (Exception, SystemExit) as err:  # SidFile may exit: keep going with the other files
+                print("Warning: cannot read", filename, err)
+                self.headers[filename] = None
+        return self.headers[filename]
+
+    def describe(self, filename):
+        """Return (date, log type, stations) of the file, None if it is not a SID file"""
+        if self.catalog:
+            description = self.catalog.describe(filename)
+            return description and (description['date'], description['logtype'], description['stations'].keys())
+        header = self.get_header(filename)
+        return header and (header.sid_params['utc_starttime'][:10], header.sid_params.get('logtype'), header.stations)
+
+    @classmethod
+    def preference(cls, filename, log_type):
+        """Sort key of the files of the same day: the lowest is read"""
+        return (os.path.basename(filename).startswith(HOURLY_PREFIX),
+                LOG_TYPE_PREFERENCE.index(log_type) if log_type in LOG_TYPE_PREFERENCE else len(LOG_TYPE_PREFERENCE),
+                not filename.endswith(BINARY_EXTENSION), filename)
+
+    def select(self, start, end, stations = None):
+        """Return {file name: stations to read in it} for the stations (default: any) between start and end:
+        one file per day and station"""
+        start_date = str(numpy.datetime64(start, 'D') - 1)  # a file may start the day before
+        end_date = str(numpy.datetime64(end, 'D'))
+        if self.catalog:
+            candidates = set()
+            for station in stations or [None]:
+                candidates.update(self.catalog.find(station = station, start_date = start_date,
+                                                    end_date = end_date, log_type = self.log_type))
+        else:
+            candidates = self.filenames
+        best = {}   # (date, station) -> (preference, file name)
+        for filename in candidates:
+            description = self.describe(filename)
+            if description is None:
+                continue
+            date, log_type, file_stations = description
+            if not start_date <= date <= end_date or (self.log_type and log_type != self.log_type):
+                continue
+            preference = SidDataset.preference(filename, log_type)
+            for station in file_stations:
+                if stations and station not in stations:
+                    continue
+                if (date, station) not in best or preference < best[(date, station)][0]:
+                    best[(date, station)] = (preference, filename)
+        selected = {}
+        for (date, station), (preference, filename) in best.items():
+            selected.setdefault(filename, set()).add(station)
+        return selected
+
+    def files_for(self, start, end, stations = None):
+        """Return the files to read for the stations (default: any) between start and end, one per day and station"""
+        return sorted(self.select(start, end, stations))
+
+    def load(self, filename, start, end):
+        """Return the SidFile of the file's readings between start and end, from the cache or read then cached,
+        None if the file cannot be read. A range covering the file's whole day is cached as the whole day."""
+        header = self.get_header(filename)
+        if header is None:
+            return None
+        day_start = numpy.datetime64(header.startTime, 'us')
+        key = (filename, max(start, day_start), min(end, day_start + numpy.timedelta64(1, 'D')))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        sid_file = header.slice(key[1], key[2])
+        self.cache[key] = sid_file
+        self.cache_size += sid_file.data.nbytes + sid_file.timestamp.nbytes
+        # forget the least recently used ranges, keep at least this one
+        while self.cache_size > self.memory_budget and len(self.cache) > 1:
+            old_key, old_file = self.cache.popitem(last = False)
+            self.cache_size -= old_file.data.nbytes + old_file.timestamp.nbytes
+        return sid_file
+
+    def get(self, start, end, stations = None, interval = None):
+        """Return (timestamps, {station: readings}) for start <= timestamp < end.
+        The timestamps are a regular grid every 'interval' seconds (default: the smallest log_interval
+        of the files), each reading is placed at its nearest grid point (the last one wins) and the missing ones are NaN."""
+        start, end = numpy.datetime64(start, 'us'), numpy.datetime64(end, 'us')
+        selected = self.select(start, end, stations)
+        filenames = sorted(selected)
+        if interval is None:
+            interval = min([self.get_header(filename).LogInterval for filename in filenames
+                            if self.get_header(filename)] or [5])
+        step = numpy.timedelta64(int(interval * 1000000), 'us')
+        timestamps = numpy.arange(start, end, step)
+        readings = {}
+        for station in stations or []:
+            readings[station] = numpy.full(len(timestamps), numpy.nan)
+        for filename in filenames:
+            sid_file = self.load(filename, start, end)
+            if sid_file is None or len(sid_file.timestamp) == 0:
+                continue
+            grid_index = numpy.clip(((sid_file.timestamp - start + step // 2) // step).astype(int),
+                                    0, len(timestamps) - 1)
+            for station in sid_file.stations:
+                if station not in selected[filename]:
+                    continue
+                if station not in readings:
+                    readings[station] = numpy.full(len(timestamps), numpy.nan)
+                readings[station][grid_index] = sid_file.get_station_data(station)
+        return timestamps, readings
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Print the readings of stations over a time range, across files.")
+    parser.add_argument("source", help="Folder of the files")
+    parser.add_argument("start", help="'YYYY-MM-DD HH:MM' UTC")
+    parser.add_argument("end", help="'YYYY-MM-DD HH:MM' UTC")
+    parser.add_argument("-s", "--stations", dest="stations", help="Comma separated list of stations, default all")
+    parser.add_argument("-i", "--interval", dest="interval", type=float, help="Seconds between two readings")
+    args = parser.parse_args()
+    dataset = SidDataset(args.source)
+    timestamps, readings = dataset.get(args.start, args.end, args.stations.split(",") if args.stations else None,
+                                       args.interval)
+    print("timestamp,", ", ".join(readings))
+    for i, timestamp in enumerate(timestamps):
+        print(str(timestamp).replace('T', ' ') + ",", ", ".join("%.15f" % readings[s][i] for s in readings))
@@ -13,15 +13,101 @@
 
     20150801:
     - truncate ['utc_starttime'] to 19 chars
+    20261018:
+    - binary format: same header, float32 station columns, memory-mappable (see BINARY_PREAMBLE)
+    - live buffer: the day's buffers shared with other processes in a binary file, see share_live_buffer() and attach()
+    - filter_buffer: vectorized filters of sidfilter.py, configurable 'filter_chain'
+    - online filtering: record_tick() keeps a filtered companion of the buffers up to date, see enable_online_filter()
+    - filtered buffers computed once per data version and shared by all the writers, see get_filtered_buffer()
+    - CSV files compressed with gzip, bzip2 or xz according to their extension (.csv.gz, .csv.bz2, .csv.xz)
+    - lazy mode: only the header is read, the data at their first access ; slice() reads only the rows of a time range
+      using a sidecar index of the byte offset of each hour (<file name>.idx)
+    - is_partial and pyramid attributes for the plotting aggregates of sidpyramid.py
 
 """
 from __future__ import print_function   # use the new Python 3 'print' function
-from datetime import datetime, timedelta
+from datetime import datetime
+import copy
+import struct
+import gzip
+import bz2
+try:
+    import lzma
+except ImportError:
+    lzma = None  # Python 2: no .xz support
+import os
+from os import path
+try:
+    from os import replace as replace_file
+except ImportError:
+    from os import rename as replace_file  # Python 2.7: atomic on POSIX only, fails on Windows if the file exists
+import threading
 import numpy
-#from matplotlib.mlab import movavg
+from sidfilter import apply_filter_chain, filter_chain_radius, DEFAULT_FILTER_CHAIN
 
 from config import FILTERED, RAW
 
+# Binary format: preamble, text header as in the CSV files, padding, data array [, timestamps array]
+#   magic, version, flags, nb_stations, nb_rows, log_interval, start (us since epoch), last_index,
+#   header size, data offset
+BINARY_PREAMBLE = struct.Struct("<8sHHIIIqqII")
+BINARY_MAGIC, BINARY_VERSION = b"SUPERSID", 1
+BINARY_TIMESTAMPS = 0x01  # flag: an int64 timestamps array (us since epoch) follows the data, else start + i * interval
+BINARY_FLOAT64 = 0x02     # flag: data is float64, else float32
+BINARY_LIVE = 0x04        # flag: live buffer of a running supersid.py, only the readings up to last_index are written
+BINARY_ALIGN = 64         # data offset alignment
+BINARY_EXTENSION = ".sidb"
+BINARY_LAST_INDEX_OFFSET = struct.calcsize("<8sHHIIIq")  # position of last_index in the preamble
+
+# Compressed CSV files: extension -> open function (streaming codecs)
+COMPRESSION_OPENERS = {'.gz': lambda filename, mode: gzip.open(filename, mode, compresslevel=6),
+                       '.bz2': lambda filename, mode: bz2.open(filename, mode)}
+if lzma:
+    COMPRESSION_OPENERS['.xz'] = lambda filename, mode: lzma.open(filename, mode)
+
+
+def open_sid_file(filename, mode = "rt"):
+    """Open a SID file, compressed or not according to its extension"""
+    extension = path.splitext(filename)[1].lower()
+    if extension in COMPRESSION_OPENERS:
+        return COMPRESSION_OPENERS[extension](filename, mode)
+    return open(filename, mode)
+
+
+def split_sid_extension(filename):
+    """Split 'filename' in (root, extension) where the extension includes the compression, e.g. '.csv.gz'"""
+    root, extension = path.splitext(filename)
+    if extension.lower() in COMPRESSION_OPENERS:
+        root, first_extension = path.splitext(root)
+        extension = first_extension + extension
+    return root, extension
+
+
+# Sidecar index of a CSV file: first row and its byte offset for each hour, then an end of file entry
+INDEX_EXTENSION = ".idx"
+INDEX_DTYPE = numpy.dtype([('hour', '<M8[h]'), ('offset', '<i8'), ('row', '<i8')])
+
+
+def find_sid_file(filename):
+    """Return 'filename' if it exists else its first existing compressed version, else 'filename'"""
+    for candidate in [filename] + [filename + extension for extension in sorted(COMPRESSION_OPENERS)]:
+        if path.isfile(candidate):
+            return candidate
+    return filename
+
+
+def write_sidecar(filename, write):
+    """Write the sidecar 'filename' by write(binary file) in a temporary file renamed once complete: the threads
+    and processes reading the sidecar never see it half written. Silently skipped on a read only folder."""
+    temp_filename = "%s.%d.%d.tmp" % (filename, os.getpid(), threading.current_thread().ident)  # unique per writer
+    try:
+        with open(temp_filename, "wb") as fout:
+            write(fout)
+        replace_file(temp_filename, filename)
+    except (IOError, OSError):  # read only folder: the sidecar is computed again when needed
+        if path.isfile(temp_filename):
+            os.remove(temp_filename)
+
 USAGE = """
 Provide some utilities to manipulate SID/SuperSID files:
     - When one file is given as argument:
@@ -31,6 +117,7 @@ Provide some utilities to manipulate SID/SuperSID files:
        - both files are SID Format: MERGE in one SID Format
        - one file is SuperSID and one is SID: MERGE the SID file with the matching station from SuperSId file
        - both are SuperSID: MERGE in one SuperSID with "station to station" matching
+    - Convert a CSV file to the binary format or a binary file to CSV
 """
 
 class SidFile():
@@ -40,8 +127,10 @@ class SidFile():
     _TIMESTAMP_STANDARD = "%Y-%m-%d %H:%M:%S"
     _TIMESTAMP_EXTENDED = "%Y-%m-%d %H:%M:%S.%f"
     _timestamp_format = _TIMESTAMP_STANDARD  # conservative default
+    _WRITE_CHUNK = 4096  # number of lines formatted and written in one call
+    _timestamp_strings_cache = {}  # (start, interval, length, extended) -> formatted timestamps of a regular day
 
-    def __init__(self, filename = "", sid_params = {}, force_read_timestamp = False):
+    def __init__(self, filename = "", sid_params = {}, force_read_timestamp = False, mmap_mode = 'c', lazy = False):
         """Two ways to create a SIDfile:
         1) A file already exists and you want to read it: use 'filename'
         2) A new empty file needs to be created: use 'sid_params'
@@ -51,18 +140,39 @@ class SidFile():
 
         Note: only one or the other parameter should be given. If both are given
         then 'filename' is taken and 'sid_params' is ignored.
+        Binary files are memory-mapped with 'mmap_mode' ('c' copy-on-write, 'r' read only, 'r+' read/write).
+        With 'lazy', only the header of a CSV file is read: the data are read at the first access to
+        'data' or 'timestamp', unless slice() is used to read only a time range.
         """
         self.version = "1.4 20150801"
         self.filename = filename
         self.sid_params = sid_params    # dictionary of all header pairs
         self.is_extended = False
         self.timestamp_format = SidFile._TIMESTAMP_STANDARD
-
-        if filename:
-            # Read all lines in a buffer used by 'read_data' and 'read_header'
+        self.last_index = -1    # binary files only: last written index of a live buffer, -1 for a complete file
+        self.live_filename = None   # binary file backing the buffers, shared with other processes
+        self.live_index = None      # memory-mapped last_index of the live buffer
+        self.is_live = False        # binary file flagged BINARY_LIVE: use live_view() for the readings written
+        self.filtered = None        # online filtered companion of self.data, see enable_online_filter()
+        self.filtered_index = -1    # last index of self.filtered up to date
+        self.data_version = 0       # incremented each time the buffers change, see data_changed()
+        self.filtered_cache = {}    # (station, bema_wing, filter_chain, gmt_offset, data_version) -> filtered buffer
+        self.lazy = False           # True while the data of a lazy SidFile are not read
+        self.is_partial = False     # True for a slice or a live view: not the whole file's readings
+        self.pyramid = None         # aggregates for plotting, see sidpyramid.get_pyramid()
+
+        if filename and SidFile.is_binary_file(filename):
+            self.read_binary(mmap_mode)
+
+        elif filename:
+            # Read the header lines and the first data line in a buffer used by 'read_header' and 'read_timestamp_format'
+            # the data lines are streamed from the file by 'read_data'
             try:
-                with open(self.filename, "rt") as fin:
-                    self.lines = fin.readlines()
+                with open_sid_file(self.filename) as fin:
+                    self.lines = []
+                    for line in fin:
+                        self.lines.append(line)
+                        if line[0] != "#": break  # first data line
             except IOError as why:
                 print ("Error reading", filename)
                 print(str(why))
@@ -71,7 +181,10 @@ class SidFile():
             self.read_header()
             self.read_timestamp_format()
             self.control_header()
-            self.read_data(force_read_timestamp)
+            if lazy:
+                self.lazy = True
+            else:
+                self.read_data(force_read_timestamp)
 
         elif self.sid_params:
             # create zeroes numpy arrays to receive data
@@ -82,14 +195,21 @@ class SidFile():
     ##
     def clear_buffer(self, next_day=False):
         """creates zeroes numpy arrays to receive data and generates the timestamp vector"""
+        self.data_changed()
         if next_day:
             self.data.fill(0.0)
+            if self.filtered is not None:
+                self.filtered.fill(0.0)
+                self.filtered_index = -1
             self.set_all_date_attributes()
         else:
             nb_data_per_day = int ( (24 * 3600) / self.LogInterval)
             self.data = numpy.zeros((len(self.stations), nb_data_per_day))
         # create an array containing the timestamps for each data reading, default initialization
         self.generate_timestamp()
+        if next_day and self.live_filename:
+            self.set_last_index(-1)
+            self.update_live_header()
 
     def control_header(self):
         '''Perform sanity check and assign standard attributes in a format independent way.
@@ -158,44 +278,220 @@ class SidFile():
                 self.timestamp_format = SidFile._TIMESTAMP_STANDARD
 
     def read_data(self, force_read_timestamp = False):
-        """Using the self.lines buffer, converts the data lines in numpy arrays.
+        """Stream the data lines of the file in numpy arrays, in bulk:
             - One array self.data for the data (one column/vector per station)
             - One array self.timestamp for the timestamps (i.e. timestamp vector)
         Reading method differs accordingly to the self.isSuperSID flag
         New: Extended format supports a timestamp for SuperSID format as well as .%f for second decimals
+        The timestamp column is read as fixed-width strings converted to datetime64 in one call: no per row converter.
+        Timestamps are always read when the file has them: 'force_read_timestamp' is kept for compatibility.
         """
-        # necessary to convert timestamp string (extended or not) to datetime AND decode byte array to string to float for python 3
-        converters_dict = {0: SidFile._StringToDatetime }
-        for i in range(len(self.stations)):
-            converters_dict[i+1] = SidFile._StringToFloat
-
-        if self.isSuperSID and not self.is_extended:
-            # classic SuperSID file format: one data column per station, no time stamp (has to be generated)
+        self.lazy = False
+        with open_sid_file(self.filename) as fin:
+            self.data, timestamp = self.parse_data_lines(fin)
+        if timestamp is None:
+            # classic SuperSID file format: no time stamp (has to be generated)
             print ("Warning: read SuperSid non extended file and generate time stamps.")
-            self.data = numpy.loadtxt(self.lines, comments='#', delimiter=",").transpose()
             self.generate_timestamp()
-        elif self.isSuperSID and self.is_extended:
-            # extended SuperSID file format: one extended time stamp then one data column per station
-            print ("Warning: read SuperSid extended file, time stamps are read & converted from file.")
-            inData = numpy.loadtxt(self.lines, dtype=datetime, comments='#', delimiter=",", converters=converters_dict)
-            self.timestamp = inData[:,0] # column 0
-            self.data = numpy.array(inData[:,1:], dtype=float).transpose()
         else:
-            # classic SID file format:
-            # two columns file: [timestamp, data]. Try to avoid reading timestamps: date str to num conversion takes time
-            # self.data must still be a 2 dimensions numpy.array even so only one vector is contained
-            if len(self.lines) - self.headerNbLines != (60 * 60 * 24) / self.LogInterval  \
-            or force_read_timestamp or self.is_extended:
-                print ("Warning: read SID file, timestamps are read & converted from file.")
-                inData = numpy.loadtxt(self.lines, dtype=datetime, comments='#', delimiter=",", converters=converters_dict)
-                self.timestamp = inData[:,0] # column 0
-                self.data = numpy.array(inData[:,1], dtype=float, ndmin=2) # column 1
-            else:
-                print ("Optimization: read SID file, generate timestamp instead of reading & converting them from file.")
-                self.data = numpy.array(numpy.loadtxt(self.lines, comments='#', delimiter=",", usecols=(1,)), ndmin=2) # only read data column
-                self.generate_timestamp()
+            self.timestamp = timestamp
         #print("self.data.shape =", self.data.shape)
 
+    def parse_data_lines(self, lines):
+        """Parse data lines, from a file or a list of strings, and return (data, timestamp).
+        timestamp is None for a classic SuperSID file which has none."""
+        if self.isSuperSID and not self.is_extended:
+            # classic SuperSID file format: one data column per station, no time stamp
+            data = numpy.loadtxt(lines, comments='#', delimiter=",", ndmin=2).transpose()
+            return data.reshape(len(self.stations), -1), None
+        # extended SuperSID file format: one extended time stamp then one data column per station
+        # SID file format: two columns [timestamp, data] i.e. one station
+        columns = ["station%d" % i for i in range(len(self.stations))]
+        dtype = [('timestamp', 'U26')] + [(column, float) for column in columns]
+        inData = numpy.loadtxt(lines, dtype=dtype, comments='#', delimiter=",", usecols=range(len(dtype)), ndmin=1)
+        return numpy.array([inData[column] for column in columns], ndmin=2), inData['timestamp'].astype('datetime64[us]')
+
+    def __getattr__(self, name):
+        """Lazy mode: read the data at the first access to 'data' or 'timestamp'"""
+        if name in ('data', 'timestamp') and self.__dict__.get('lazy'):
+            self.read_data()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    ##
+    ##  Time range: read only the rows of the hours needed thanks to the sidecar index
+    ##
+    def read_row_index(self):
+        """Return the sidecar index of the CSV file: first row and byte offset of each hour, then the end of file.
+        It is built by scanning the lines (no parsing) if missing or older than the file."""
+        index_filename = self.filename + INDEX_EXTENSION
+        if path.isfile(index_filename) and path.getmtime(index_filename) >= path.getmtime(self.filename):
+            with open(index_filename, "rb") as fin:
+                return numpy.fromfile(fin, dtype=INDEX_DTYPE)
+        start_hour = numpy.datetime64(self.startTime, 'h')
+        hours, offsets, rows = [], [], []
+        offset, row, previous_hour = 0, 0, None
+        with open_sid_file(self.filename, "rb") as fin:
+            for line in fin:
+                if line[:1] != b"#" and line.strip():
+                    if self.isSuperSID and not self.is_extended:
+                        hour = start_hour + row * self.LogInterval // 3600
+                    else:
+                        hour = line[:13].decode('utf-8')  # YYYY-MM-DD HH of the timestamp
+                    if hour != previous_hour:
+                        hours.append(str(hour).replace(' ', 'T'))
+                        offsets.append(offset)
+                        rows.append(row)
+                        previous_hour = hour
+                    row += 1
+                offset += len(line)
+        index = numpy.zeros(len(hours) + 1, dtype=INDEX_DTYPE)
+        index['hour'][:-1] = hours
+        index['hour'][-1] = (index['hour'][-2] + 1) if hours else start_hour
+        index['offset'] = offsets + [offset]
+        index['row'] = rows + [row]
+        write_sidecar(index_filename, index.tofile)  # on a read only folder, the index is used once
+        return index
+
+    def slice(self, start_dt, end_dt):
+        """Return a SidFile holding only the readings with start_dt <= timestamp < end_dt (datetime or datetime64).
+        A lazy CSV file reads only the rows of the hours involved ; loaded data and binary files are not copied."""
+        start, end = numpy.datetime64(start_dt, 'us'), numpy.datetime64(end_dt, 'us')
+        sid_slice = copy.copy(self)
+        sid_slice.lazy = False
+        sid_slice.filtered, sid_slice.filtered_cache = None, {}
+        sid_slice.is_partial, sid_slice.pyramid = True, None
+        if self.lazy:
+            index = self.read_row_index()
+            # from the hour containing 'start' to the hour containing 'end'
+            first = max(0, numpy.searchsorted(index['hour'][:-1], start.astype('datetime64[h]'), side='right') - 1)
+            last = max(first, numpy.searchsorted(index['hour'][:-1], end, side='left'))
+            with open_sid_file(self.filename, "rb") as fin:
+                fin.seek(int(index['offset'][first]))
+                lines = fin.read(int(index['offset'][last] - index['offset'][first])).decode('utf-8').splitlines()
+            if lines:
+                data, timestamp = self.parse_data_lines(lines)
+            else:
+                data, timestamp = numpy.zeros((len(self.stations), 0)), numpy.array([], dtype='datetime64[us]')
+            if timestamp is None:
+                timestamp = numpy.datetime64(self.startTime, 'us') + \
+                            (index['row'][first] + numpy.arange(data.shape[1])) * numpy.timedelta64(self.LogInterval, 's')
+        else:
+            data, timestamp = self.data, self.timestamp
+        # the timestamps are sorted: the range is a view
+        first, last = numpy.searchsorted(timestamp, start), numpy.searchsorted(timestamp, end)
+        sid_slice.data, sid_slice.timestamp = data[:, first:last], timestamp[first:last]
+        return sid_slice
+
+    @classmethod
+    def is_binary_file(cls, filename):
+        """True if the file starts with the binary format's magic"""
+        try:
+            with open(filename, "rb") as fin:
+                return fin.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+        except IOError:
+            return False
+
+    def read_binary(self, mode='c'):
+        """Read a binary file: parse its text header then memory-map its arrays.
+        Default mode 'c' is copy-on-write: the data can be modified in memory, the file is never changed."""
+        with open(self.filename, "rb") as fin:
+            (magic, version, flags, nb_stations, nb_rows, log_interval,
+             start_us, self.last_index, header_size, data_offset) = BINARY_PREAMBLE.unpack(fin.read(BINARY_PREAMBLE.size))
+            self.lines = fin.read(header_size).decode('utf-8').splitlines(True)
+        if version > BINARY_VERSION:
+            print("Warning: binary file version %d is newer than this program's %d." % (version, BINARY_VERSION))
+        self.read_header()
+        self.control_header()
+        self.is_extended = bool(flags & BINARY_TIMESTAMPS)
+        self.is_live = bool(flags & BINARY_LIVE)
+        if self.is_extended:
+            self.timestamp_format = SidFile._TIMESTAMP_EXTENDED
+        self.data, self.timestamp = SidFile.map_binary(self.filename, mode)
+
+    @classmethod
+    def map_binary(cls, filename, mode):
+        """Return the memory-mapped (data, timestamp) arrays of a binary file,
+        timestamps are generated when the file does not store them."""
+        with open(filename, "rb") as fin:
+            (magic, version, flags, nb_stations, nb_rows, log_interval,
+             start_us, last_index, header_size, data_offset) = BINARY_PREAMBLE.unpack(fin.read(BINARY_PREAMBLE.size))
+        dtype = '<f8' if flags & BINARY_FLOAT64 else '<f4'
+        if nb_stations == 0 or nb_rows == 0:  # nothing to map: numpy.memmap refuses an empty mapping
+            return numpy.zeros((nb_stations, 0), dtype=dtype), numpy.array([], dtype='datetime64[us]')
+        data = numpy.memmap(filename, mode=mode, offset=data_offset, shape=(nb_stations, nb_rows), dtype=dtype)
+        if flags & BINARY_TIMESTAMPS:
+            timestamp = numpy.memmap(filename, mode=mode, dtype='<M8[us]', shape=(nb_rows,), offset=data_offset + data.nbytes)
+        else:
+            timestamp = numpy.datetime64(start_us, 'us') + numpy.arange(nb_rows) * numpy.timedelta64(log_interval, 's')
+        return data, timestamp
+
+    ##
+    ##  Live buffer: the buffers of the running supersid.py shared through a binary file
+    ##
+    def share_live_buffer(self, filename):
+        """Move the data and timestamp buffers to the binary file 'filename', memory-mapped in read/write mode.
+        Other processes read the live data with SidFile.attach(filename) without any save of the buffers.
+        The file is written aside then renamed: the readers still attached to the previous file keep their mapping."""
+        temp_filename = "%s.%d.tmp" % (filename, os.getpid())
+        self.write_data_binary(temp_filename, RAW, apply_bema = False, float64 = True,
+                               last_index = self.last_index, store_timestamps = True, live = True)
+        replace_file(temp_filename, filename)
+        self.live_filename = filename
+        self.is_live = True
+        self.data, self.timestamp = SidFile.map_binary(filename, 'r+')
+        self.live_index = numpy.memmap(filename, mode='r+', dtype='<i8', offset=BINARY_LAST_INDEX_OFFSET, shape=(1,))
+
+    def set_last_index(self, index):
+        """Publish the index of the last reading written in the live buffer"""
+        self.last_index = index
+        if self.live_index is not None:
+            self.live_index[0] = index
+
+    def get_last_index(self):
+        """Return the index of the last reading written in the live buffer, -1 if none"""
+        if self.live_index is not None:
+            self.last_index = int(self.live_index[0])
+        return self.last_index
+
+    def update_live_header(self):
+        """Rewrite the preamble and header of the live buffer file after a change of day"""
+        header = self.create_binary_header(RAW, BINARY_TIMESTAMPS | BINARY_FLOAT64 | BINARY_LIVE, self.data.shape,
+                                           numpy.datetime64(self.startTime, 'us'), self.last_index)
+        with open(self.live_filename, "r+b") as fout:
+            (magic, version, flags, nb_stations, nb_rows, log_interval,
+             start_us, last_index, header_size, data_offset) = BINARY_PREAMBLE.unpack(fout.read(BINARY_PREAMBLE.size))
+            if len(header) != data_offset:
+                print("Warning: the header of", self.live_filename, "does not fit, it is not updated.")
+                return
+            fout.seek(0)
+            fout.write(header)
+
+    def close_live_buffer(self):
+        """Flush the live buffer to its file"""
+        if self.live_filename:
+            self.data.flush()
+            self.timestamp.flush()
+            self.live_index.flush()
+
+    @classmethod
+    def attach(cls, filename):
+        """Read-only, zero-copy access to the live buffer written by supersid.py in 'filename'.
+        The arrays follow the new readings: use get_last_index() or live_view() to know which are written."""
+        sid = cls(filename, mmap_mode = 'r')
+        sid.live_index = numpy.memmap(filename, mode='r', dtype='<i8', offset=BINARY_LAST_INDEX_OFFSET, shape=(1,))
+        return sid
+
+    def live_view(self):
+        """Return a shallow copy of this SidFile whose data and timestamp are views limited to the written readings,
+        empty until the first reading is written"""
+        nb_readings = self.get_last_index() + 1
+        sid_view = copy.copy(self)
+        sid_view.data = self.data[:, :nb_readings]
+        sid_view.timestamp = self.timestamp[:nb_readings]
+        sid_view.is_partial, sid_view.pyramid = True, None
+        return sid_view
+
     @classmethod
     def _StringToDatetime(cls, strTimestamp):
         if type(strTimestamp) is not str: # i.e. byte array in Python 3
@@ -216,14 +512,17 @@ class SidFile():
         return float(strNumber)
 
     def generate_timestamp(self):
-        """Create the timestamp vector by adding LogInterval seconds to UTC_StartTime"""
-        self.timestamp = numpy.empty(len(self.data[0]), dtype=datetime)
-        # add 'interval' seconds to UTC_StartTime for each entries
-        interval =  timedelta(seconds=self.LogInterval)
-        currentTimestamp = self.startTime
-        for i in range(len(self.timestamp)):
-            self.timestamp[i] =  currentTimestamp
-            currentTimestamp += interval
+        """Create the datetime64[us] timestamp vector by adding LogInterval seconds to UTC_StartTime"""
+        timestamp = numpy.datetime64(self.startTime, 'us') + \
+                    numpy.arange(len(self.data[0])) * numpy.timedelta64(self.LogInterval, 's')
+        if self.live_filename:
+            self.timestamp[:] = timestamp  # in place: the live buffer stays shared
+        else:
+            self.timestamp = timestamp
+
+    def get_datetimes(self):
+        """Return the timestamps as an array of datetime objects, for the APIs not supporting numpy.datetime64"""
+        return self.timestamp.astype(object)
     ##
     ##  Facilitator functions
     ##
@@ -237,6 +536,15 @@ class SidFile():
         site = self.sid_params['site_name'] if 'site_name' in self.sid_params else self.sid_params['site']
         return "%s_%s.csv" % (site, self.sid_params["utc_starttime"][:10])
 
+    def get_live_filename(self):
+        """Return the live buffer file name as <Site Name>_live.sidb like RASPI_live.sidb"""
+        site = self.sid_params['site_name'] if 'site_name' in self.sid_params else self.sid_params['site']
+        return "%s_live%s" % (site, BINARY_EXTENSION)
+
+    def get_binary_filename(self):
+        """Return a file name as <Site Name>_<UTC Start Date>.sidb like RASPI_2013-08-31.sidb"""
+        return self.get_supersid_filename()[:-4] + BINARY_EXTENSION
+
     def get_station_data(self, stationId):
         """Return the numpy array of the given station's data"""
         try:
@@ -257,6 +565,20 @@ class SidFile():
         else:
             return self.stations.index(station.call_sign)  # throw a ValueError if 'station' is not in the list
 
+    def snapshot(self):
+        """Return a copy of this SidFile owning its data, timestamp and sid_params.
+        Cheap consistent image of the live buffers that can be written while the capture goes on."""
+        sid_copy = copy.copy(self)
+        sid_copy.sid_params = dict(self.sid_params)
+        sid_copy.data = numpy.array(self.data)
+        sid_copy.timestamp = numpy.array(self.timestamp)
+        sid_copy.live_filename, sid_copy.live_index, sid_copy.is_live = None, None, False
+        if self.filtered is not None:
+            sid_copy.filtered = self.filtered.copy()
+        sid_copy.filtered_cache = {}  # the writers of the snapshot share its own cache
+        sid_copy.pyramid = None
+        return sid_copy
+
     def copy_data(self, second_sidfile):
         """Copy the second_sidfile's data on the current data vector for every common stations.
            If a copy is done then the timestamps are also copied."""
@@ -270,7 +592,71 @@ class SidFile():
                 # missing station in the second file
                 pass
         if has_copied:
-            self.timestamp = second_sidfile.timestamp[:] # deep copy
+            if self.live_filename:
+                self.timestamp[:] = second_sidfile.timestamp
+            else:
+                self.timestamp = numpy.array(second_sidfile.timestamp, dtype='datetime64[us]') # deep copy
+            self.refresh_filtered()
+
+    ##
+    ##  Online filtering: the filtered values follow the readings, written files only copy them
+    ##
+    def enable_online_filter(self, bema_wing = 6, filter_chain = DEFAULT_FILTER_CHAIN):
+        """Maintain self.filtered, the filtered version of self.data, as readings are recorded by record_tick()"""
+        self.filter_params = (bema_wing, filter_chain)
+        self.filter_radius = filter_chain_radius(bema_wing, filter_chain)
+        self.filtered = numpy.zeros(self.data.shape)
+        self.refresh_filtered()
+
+    def data_changed(self):
+        """Invalidate the filtered buffers cached by get_filtered_buffer(): to call after any change of self.data"""
+        self.data_version += 1
+        self.filtered_cache.clear()
+
+    def refresh_filtered(self):
+        """Filter the whole buffers again, after they were modified without record_tick()"""
+        self.data_changed()
+        if self.filtered is not None:
+            for iStation, raw_buffer in enumerate(self.data):
+                self.filtered[iStation] = apply_filter_chain(raw_buffer, *self.filter_params)
+            self.filtered_index = len(self.timestamp) - 1
+
+    def record_tick(self, index, utc_now, strengths):
+        """Save the signal strengths of one reading in the buffers, publish it and update the filtered buffers"""
+        if len(strengths) == len(self.stations):
+            self.data[:, index] = strengths
+        self.timestamp[index] = utc_now
+        self.set_last_index(index)
+        self.data_changed()
+        self.update_filtered(index)
+
+    def update_filtered(self, index):
+        """Update self.filtered after the reading at 'index': the filtered values in a radius of that reading change.
+        The readings beyond 'index' are unknown: the filters extend the last value as at the end of a day,
+        hence the last values are provisional until the next readings arrive, exact at the end of the day."""
+        if self.filtered is None:
+            return
+        first = max(0, min(index, self.filtered_index + 1) - self.filter_radius)  # first filtered value to update
+        start = max(0, first - self.filter_radius)   # first raw reading needed to compute it
+        for iStation, raw_buffer in enumerate(self.data):
+            self.filtered[iStation, first:index + 1] = \
+                apply_filter_chain(raw_buffer[start:index + 1], *self.filter_params)[first - start:]
+        self.filtered_index = index
+
+    def get_filtered_buffer(self, iStation, bema_wing = 6, filter_chain = DEFAULT_FILTER_CHAIN, gmt_offset = 0):
+        """Return the filtered buffer of the station, computed once per version of the data:
+        all the formats written in one save pass share it. Taken from the online filtered buffer if its
+        parameters match else the raw buffer is filtered. The returned array is read only."""
+        key = (self.stations[iStation], bema_wing, filter_chain, gmt_offset, self.data_version)
+        if key not in self.filtered_cache:
+            if self.filtered is not None and self.filter_params == (bema_wing, filter_chain):
+                filtered = SidFile.shift_gmt_offset(self.filtered[iStation].copy(), self.LogInterval, gmt_offset)
+            else:
+                filtered = SidFile.filter_buffer(self.data[iStation], self.LogInterval, bema_wing = bema_wing,
+                                                 gmt_offset = gmt_offset, filter_chain = filter_chain)
+            filtered.flags.writeable = False
+            self.filtered_cache[key] = filtered
+        return self.filtered_cache[key]
 
     ##
     ##  Write a SID File
@@ -304,7 +690,35 @@ class SidFile():
             hdr += "# Frequency = %s\n" % self.sid_params['frequency']
         return hdr
 
-    def write_data_sid(self, station, filename, log_type, apply_bema = True, extended = False, bema_wing = 6):
+    def get_timestamp_strings(self, extended = False):
+        """Return the timestamps formatted as in the files, in one vectorized conversion.
+        A regular series (UTC_StartTime + i * LogInterval) is formatted once and kept in a cache."""
+        timestamps = numpy.asarray(self.timestamp, dtype='datetime64[us]')
+        key = None
+        if len(timestamps):
+            start, interval = timestamps[0], numpy.timedelta64(self.LogInterval, 's')
+            if (timestamps == start + numpy.arange(len(timestamps)) * interval).all():
+                key = (start, self.LogInterval, len(timestamps), extended)
+                strings = SidFile._timestamp_strings_cache.get(key)
+                if strings is not None:
+                    return strings
+        strings = numpy.char.replace(numpy.datetime_as_string(timestamps, unit='us' if extended else 's'), 'T', ' ')
+        if key:
+            # only the current day is worth keeping ; a new dictionary, not cleared under another thread's feet
+            SidFile._timestamp_strings_cache = {key: strings}
+        return strings
+
+    @classmethod
+    def _write_lines(cls, fout, line_format, columns):
+        """Write one line per row of the given columns with 'line_format' % (column values),
+        formatting and writing _WRITE_CHUNK lines per call instead of one print() per line."""
+        nb_lines = len(columns[0]) if columns else 0
+        for start in range(0, nb_lines, cls._WRITE_CHUNK):
+            chunk = [numpy.asarray(column[start:start + cls._WRITE_CHUNK]).tolist() for column in columns]
+            fout.write("".join(map(line_format.__mod__, zip(*chunk))))
+
+    def write_data_sid(self, station, filename, log_type, apply_bema = True, extended = False, bema_wing = 6,
+                       filter_chain = DEFAULT_FILTER_CHAIN):
         """Write in the file 'filename' the dataset of the given station using the SID format
         i.e. "TimeStamp, Data" lines
         Header respects the SID format definition i.e. conversion if self is SuperSid
@@ -319,91 +733,97 @@ class SidFile():
         if log_type == RAW or apply_bema == False:
             tmp_data = self.data[iStation]
         else: # filtered
-            tmp_data = SidFile.filter_buffer(self.data[iStation], self.LogInterval, bema_wing = bema_wing)
+            tmp_data = self.get_filtered_buffer(iStation, bema_wing, filter_chain)
         # write file in SID format
-        with open(filename, "wt") as fout:
+        with open_sid_file(filename, "wt") as fout:
             # generate header
             hdr = self.create_header(isSuperSid = False, log_type = log_type)
             print(hdr, file=fout, end="")
             # generate the "timestamp, data" serie i.e. data lines
-            timestamp_format = SidFile._TIMESTAMP_EXTENDED if extended else SidFile._TIMESTAMP_STANDARD ###"%Y-%m-%d %H:%M:%S.%f" if extended else "%Y-%m-%d %H:%M:%S"
-            for t_stamp, x in zip(self.timestamp, tmp_data):
-                print("%s, %.15f" % (t_stamp.strftime(timestamp_format), x), file=fout)
+            self._write_lines(fout, "%s, %.15f\n", [self.get_timestamp_strings(extended), tmp_data])
 
-    def write_data_supersid(self, filename, log_type, apply_bema = True, extended = False, bema_wing = 6):
+    def write_data_supersid(self, filename, log_type, apply_bema = True, extended = False, bema_wing = 6,
+                            filter_chain = DEFAULT_FILTER_CHAIN):
         """Write the SuperSID file. Attention: self.sid_params must contain all expected entries."""
         # force to SuperSid format
         hdr = self.create_header(isSuperSid = True, log_type = log_type)
         # create file and write header
-        with open(filename, "wt") as fout:
+        with open_sid_file(filename, "wt") as fout:
             print(hdr, file=fout, end="")
             # intermediate buffer to have 'raw' or 'filtered' data (as in  as in RAW/FILTERED)
             if log_type == RAW or apply_bema == False:
                 tmp_data = self.data
             else: # filtered
-                tmp_data = []
-                for stationData in self.data:
-                    tmp_data.append(SidFile.filter_buffer(stationData, self.LogInterval, bema_wing = bema_wing))
-                tmp_data = numpy.array(tmp_data)
+                tmp_data = numpy.array([self.get_filtered_buffer(iStation, bema_wing, filter_chain)
+                                        for iStation in range(len(self.stations))])
             #print(tmp_data.shape)  # should be like (2, 17280)
+            floats_format = ", ".join(["%.15f"] * len(tmp_data))
             if extended:
-                for t_stamp, row in zip(self.timestamp, numpy.transpose(tmp_data)):
-                    floats_as_strings = ["%.15f" % x for x in row]
-                    print( t_stamp.strftime(SidFile._TIMESTAMP_EXTENDED+","), ", ".join(floats_as_strings), file=fout)
+                self._write_lines(fout, "%s, " + floats_format + "\n", [self.get_timestamp_strings(True)] + list(tmp_data))
             else:
-                for row in numpy.transpose(tmp_data):
-                    floats_as_strings = ["%.15f" % x for x in row]
-                    print(", ".join(floats_as_strings), file=fout)
+                self._write_lines(fout, floats_format + "\n", list(tmp_data))
 
         # append data to file using numpy function (symmetric to loadtxt)
         # note for future: version 1.7 offers "header=hdr" as new function parameter
         # but for now (1.6) we write header first then savetxt() append data lines
         #numpy.savetxt(filename, tmp_data, delimiter=",", newline="\n", header=hdr)
 
+    def create_binary_header(self, log_type, flags, shape, start, last_index = -1):
+        """Return the preamble, the text header and the padding up to the data of a binary file"""
+        hdr = self.create_header(isSuperSid = self.isSuperSID, log_type = log_type).encode('utf-8')
+        data_offset = -(-(BINARY_PREAMBLE.size + len(hdr)) // BINARY_ALIGN) * BINARY_ALIGN
+        return BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, flags, shape[0], shape[1], self.LogInterval,
+                                    start.astype('int64'), last_index, len(hdr), data_offset) \
+               + hdr + b"\0" * (data_offset - BINARY_PREAMBLE.size - len(hdr))
+
+    def write_data_binary(self, filename, log_type, apply_bema = True, bema_wing = 6, float64 = False, last_index = -1,
+                          store_timestamps = None, filter_chain = DEFAULT_FILTER_CHAIN, live = False):
+        """Write the binary file: the same header as the CSV files then the stations' data as float32 (or float64)
+        and the timestamps if 'store_timestamps' or, by default, only if they are not regular.
+        'live' flags the file as a live buffer (BINARY_LIVE)."""
+        # intermediate buffer to have 'raw' or 'filtered' data (as in  as in RAW/FILTERED)
+        if log_type == RAW or apply_bema == False:
+            tmp_data = self.data
+        else: # filtered
+            tmp_data = numpy.array([self.get_filtered_buffer(iStation, bema_wing, filter_chain)
+                                    for iStation in range(len(self.stations))])
+        tmp_data = numpy.ascontiguousarray(tmp_data, dtype='<f8' if float64 else '<f4')
+        timestamps = numpy.asarray(self.timestamp, dtype='<M8[us]')
+        start = timestamps[0] if len(timestamps) else numpy.datetime64(self.startTime, 'us')
+        if store_timestamps is None:
+            store_timestamps = not (timestamps == start + numpy.arange(len(timestamps))
+                                    * numpy.timedelta64(self.LogInterval, 's')).all()
+        flags = (BINARY_TIMESTAMPS if store_timestamps else 0) | (BINARY_FLOAT64 if float64 else 0) \
+                | (BINARY_LIVE if live else 0)
+        with open(filename, "wb") as fout:
+            fout.write(self.create_binary_header(log_type, flags, tmp_data.shape, start, last_index))
+            fout.write(tmp_data.tobytes())
+            if store_timestamps:
+                fout.write(timestamps.tobytes())
+
     @classmethod
-    def filter_buffer(cls, raw_buffer, data_interval, bema_wing = 6, gmt_offset = 0):
-            '''
-            Return bema filtered version of the buffer, with optional time_zone_offset.
-            bema filter uses the minimal found value to represent the data points within a range (bema_window)
-            bema_wing = 6 => window = 13 (bema_wing + evaluating point + bema_wing)
-            '''
-            length = len(raw_buffer)
-            # Extend 2 wings to the raw data buffer before taking min and average
-            dstack = numpy.hstack((raw_buffer[length-bema_wing:length],
-                                   raw_buffer[0:length],
-                                   raw_buffer[0:bema_wing]))
-            # Fill the 2 wings with the values at the edge
-            dstack[0:bema_wing] = raw_buffer[0]  #  dstack[bema_wing]
-            dstack[length+bema_wing:length+bema_wing*2] = raw_buffer[-1]  # dstack[length+bema_wing-1]
-            # Use the lowest point found in window to represent its value
-            dmin = numpy.zeros(len(dstack))
-            for i in range(bema_wing, length+bema_wing):
-                dmin[i] = min(dstack[i-bema_wing:i+bema_wing])
-            # The points beyond the left edge, set to the starting point value
-            dmin[0:bema_wing] = dmin[bema_wing]
-            # The points beyond the right edge, set to the ending point value
-            dmin[length+bema_wing:length+bema_wing*2] = dmin[length+bema_wing-1]
-            # Moving Average. This actually truncates array to original size
-            #daverage = movavg(dmin, (bema_wing*2+1))
-            def movang(a, n) :
-                ret = np.cumsum(a, dtype=float)
-                ret[n:] = ret[n:] - ret[:-n]
-                return ret[n - 1:] / n
-            daverage = movavg(dmin, (bema_wing*2+1))     
-         
-            if gmt_offset == 0:
-                return daverage
-            else:
-                gmt_mark = gmt_offset * (60/data_interval) * 60
-                doffset = numpy.hstack((daverage[gmt_mark:length],daverage[0:gmt_mark]))
-                return doffset
+    def filter_buffer(cls, raw_buffer, data_interval, bema_wing = 6, gmt_offset = 0, filter_chain = DEFAULT_FILTER_CHAIN):
+        '''
+        Return bema filtered version of the buffer, with optional time_zone_offset.
+        bema filter uses the minimal found value to represent the data points within a range (bema_window)
+        bema_wing = 6 => window = 13 (bema_wing + evaluating point + bema_wing)
+        'filter_chain' lists the filters applied one after the other, see sidfilter.py
+        '''
+        return SidFile.shift_gmt_offset(apply_filter_chain(raw_buffer, bema_wing, filter_chain), data_interval, gmt_offset)
+
+    @classmethod
+    def shift_gmt_offset(cls, buffer, data_interval, gmt_offset):
+        """Rotate the day's buffer by the number of readings in gmt_offset hours"""
+        if gmt_offset == 0:
+            return buffer
+        gmt_mark = int(round(gmt_offset * 3600.0 / data_interval))
+        return numpy.roll(buffer, -gmt_mark)
 
 ##-------------------------------------------------------------------------------
 ##  This module can be used alone as a utility to manipulate SID Files
 ##  To see its options, execute at prompt level :   sidfile.py -h
 ##
 if __name__ == '__main__':
-    from os import path
     import argparse
 
     def exist_file(x):
@@ -414,7 +834,7 @@ if __name__ == '__main__':
             raise argparse.ArgumentError("{0} does not exist".format(x))
         return x
 
-    fmerge = lambda x: "%s.merge%s" % path.splitext(x)  # /original/path/name.merge.ext
+    fmerge = lambda x: "%s.merge%s" % split_sid_extension(x)  # /original/path/name.merge.ext
     # check that one or two arguments are given
     parser = argparse.ArgumentParser()
     parser.add_argument("-s", "--split", dest="filename_split", required=False, type=exist_file,
@@ -425,11 +845,13 @@ if __name__ == '__main__':
                             help="Display information about one file")
     parser.add_argument("-f", "--filter", dest="filename_filter", required=False, type=exist_file,
                             help="Filter a raw file")
+    parser.add_argument("-c", "--convert", dest="filename_convert", required=False, type=exist_file,
+                            help="Convert a CSV file to the binary format (%s) or a binary file to CSV" % BINARY_EXTENSION)
     parser.add_argument("-b", "--bema_wing", dest="bema_wing", required=False, type=int, default=6,
                             help="Width of the window used in filtering a.k.a. 'bema_wing' (default=6)")
     args, unk = parser.parse_known_args()
     if args.filename_info:
-        sid = SidFile(args.filename_info, force_read_timestamp = True)
+        sid = SidFile(args.filename_info, lazy = True)   # data read when needed, after the header
         print("-" * 5, "Header information", "-" * 5)
         if sid.is_extended:
             print("Time stamps are extended.")
@@ -446,9 +868,9 @@ if __name__ == '__main__':
         for i in range(len(sid.timestamp)):
             if sid.data[0][i] != 0.0: break
         if i == len(sid.timestamp): i = 0
-        for t_stamp, row in zip(sid.timestamp[i:i+5], numpy.transpose(sid.data)[i:i+5]):
+        for t_stamp, row in zip(sid.get_timestamp_strings(sid.is_extended)[i:i+5], numpy.transpose(sid.data)[i:i+5]):
             floats_as_strings = ["%.15f" % x for x in row]
-            print( t_stamp.strftime(sid.timestamp_format+","), ", ".join(floats_as_strings))
+            print(t_stamp + ",", ", ".join(floats_as_strings))
         # print the whole dictionary
         print("-" * 5, "sid_params", "-" * 5)
         for key, value in sid.sid_params.items():
@@ -497,7 +919,7 @@ if __name__ == '__main__':
         # Convert a RAW file into a Filtered one. Can filter an already filtered file too...
         # optional parameter --bema_wing can be specified
         sid = SidFile(args.filename_filter, force_read_timestamp = True)
-        fname = "%s.filtered%s" % path.splitext(args.filename_filter)
+        fname = "%s.filtered%s" % split_sid_extension(args.filename_filter)
         if sid.sid_params['logtype'] != RAW:
             print("Warning: %s is not a raw file. This might filter an already filtered file." % args.filename_filter)
         bema_wing = args.bema_wing if args.bema_wing else 6
@@ -505,5 +927,19 @@ if __name__ == '__main__':
             sid.write_data_supersid(fname, log_type=FILTERED, apply_bema = True, extended = sid.is_extended, bema_wing=bema_wing)
         else:
             sid.write_data_sid(sid.stations[0], fname, log_type=FILTERED, apply_bema = True, extended = sid.is_extended, bema_wing=bema_wing)
+    elif args.filename_convert:
+        # CSV to binary or binary to CSV (extended to keep the timestamps): header and log type are kept
+        sid = SidFile(args.filename_convert, force_read_timestamp = True)
+        log_type = sid.sid_params.get('logtype', RAW)
+        if SidFile.is_binary_file(args.filename_convert):
+            fname = split_sid_extension(args.filename_convert)[0] + ".csv"
+            if sid.isSuperSID:
+                sid.write_data_supersid(fname, log_type, apply_bema = False, extended = True)
+            else:
+                sid.write_data_sid(sid.stations[0], fname, log_type, apply_bema = False, extended = True)
+        else:
+            fname = split_sid_extension(args.filename_convert)[0] + BINARY_EXTENSION
+            sid.write_data_binary(fname, log_type, apply_bema = False)
+        print(fname, "created.")
     else:
         parser.print_help()
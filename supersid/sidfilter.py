@@ -0,0 +1,80 @@
+"""
+    sidfilter.py
+    Filter engine for the SID signals: vectorized filters chained as declared by 'filter_chain' in the .cfg
+
+    Each filter takes a 1-D buffer and the 'wing' of its window (window = wing + evaluated point + wing)
+    and returns a buffer of the same length, the edges being extended with the first/last value.
+    - min: sliding minimum, O(n) whatever the window (van Herk/Gil-Werman)
+    - average: moving average computed from a cumulative sum
+    - bema: the historical SuperSID filter, sliding minimum then moving average
+"""
+#   Change tracking:
+#   20261018:
+#   - first version: replaces the interpreted loop of SidFile.filter_buffer and the missing mlab.movavg
+from __future__ import print_function   # use the new Python 3 'print' function
+import numpy
+
+DEFAULT_FILTER_CHAIN = 'bema'
+
+
+def sliding_min(buffer, wing):
+    """Minimum of each window of 2 * wing + 1 points centered on each point of the buffer"""
+    window = 2 * wing + 1
+    if wing <= 0 or len(buffer) == 0:
+        return numpy.array(buffer, dtype=float)
+    padded = numpy.pad(numpy.asarray(buffer, dtype=float), wing, mode='edge')
+    # van Herk/Gil-Werman: cut in blocks of 'window' points, min of a window = min(suffix min, prefix min)
+    nb_blocks = -(-len(padded) // window)
+    blocks = numpy.pad(padded, (0, nb_blocks * window - len(padded)), mode='edge').reshape(nb_blocks, window)
+    prefix = numpy.minimum.accumulate(blocks, axis=1).ravel()
+    suffix = numpy.minimum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return numpy.minimum(suffix[:len(buffer)], prefix[window - 1:window - 1 + len(buffer)])
+
+
+def moving_average(buffer, wing):
+    """Mean of each window of 2 * wing + 1 points centered on each point of the buffer"""
+    window = 2 * wing + 1
+    if wing <= 0 or len(buffer) == 0:
+        return numpy.array(buffer, dtype=float)
+    padded = numpy.pad(numpy.asarray(buffer, dtype=float), wing, mode='edge')
+    cumsum = numpy.concatenate(([0.0], numpy.cumsum(padded)))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def bema(buffer, wing):
+    """Lowest value found in the window averaged over the window"""
+    return moving_average(sliding_min(buffer, wing), wing)
+
+
+FILTERS = {'min': sliding_min, 'average': moving_average, 'bema': bema}
+
+
+def parse_filter_chain(filter_chain):
+    """Return the list of filter names of a comma separated 'filter_chain' like 'min,average'"""
+    return [name.strip().lower() for name in filter_chain.split(",") if name.strip()]
+
+
+def filter_chain_radius(wing, filter_chain = DEFAULT_FILTER_CHAIN):
+    """Number of readings on each side of a point that its filtered value depends on"""
+    return sum(2 * wing if name == 'bema' else wing for name in parse_filter_chain(filter_chain))
+
+
+def apply_filter_chain(buffer, wing, filter_chain = DEFAULT_FILTER_CHAIN):
+    """Apply the filters of 'filter_chain' one after the other"""
+    filtered = numpy.asarray(buffer, dtype=float)
+    for name in parse_filter_chain(filter_chain):
+        filtered = FILTERS[name](filtered, wing)
+    return filtered
+
+
+if __name__ == '__main__':
+    import timeit
+    # compare with the reference: Python loop over the windows
+    raw = numpy.random.rand(17280)
+    wing = 6
+    padded = numpy.pad(raw, wing, mode='edge')
+    dmin = numpy.array([padded[i:i + 2 * wing + 1].min() for i in range(len(raw))])
+    padded = numpy.pad(dmin, wing, mode='edge')
+    reference = numpy.array([padded[i:i + 2 * wing + 1].mean() for i in range(len(raw))])
+    print("max error:", abs(bema(raw, wing) - reference).max())
+    print("bema on one day at 5 s interval: %.2f ms" % (timeit.timeit(lambda: bema(raw, wing), number=100) * 10))
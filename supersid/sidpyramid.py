@@ -0,0 +1,161 @@
+"""
+    sidpyramid.py
+    Multi-resolution aggregates of a SID file for fast plotting
+
+    For each station, the readings are aggregated in buckets of 1 minute, 10 minutes and 1 hour:
+    min, max, mean and count of the readings in each bucket. They are stored next to the file
+    in '<file name>.pyr.npz' and recomputed when the file is newer.
+    A plot of N pixels wide needs about N points: the coarsest level having at least one bucket per pixel
+    is drawn as its min/max envelope, the raw readings are not even read when the sidecar exists.
+    The envelope (or the raw readings if no level fits) is then decimated to the pixels: min/max per pixel
+    or Largest-Triangle-Three-Buckets (LTTB).
+"""
+#   Change tracking:
+#   20261018:
+#   - first version
+from __future__ import print_function   # use the new Python 3 'print' function
+from os import path
+import numpy
+from sidfile import write_sidecar
+
+LEVELS = (60, 600, 3600)    # bucket durations in seconds, finest first
+PYRAMID_EXTENSION = ".pyr.npz"
+
+
+def build_pyramid(timestamp, data):
+    """Return {level: {'time', 'min', 'max', 'mean', 'count'}} for the readings (data has one row per station).
+    'time' is the start of each bucket, the empty buckets have a NaN min/max/mean and a 0 count."""
+    data = numpy.asarray(data, dtype=float).reshape(-1, len(timestamp))
+    seconds = numpy.asarray(timestamp).astype('datetime64[s]').astype(numpy.int64)
+    pyramid = {}
+    for level in LEVELS:
+        if len(seconds) == 0:
+            empty = numpy.zeros((len(data), 0))
+            pyramid[level] = {'time': numpy.array([], dtype='datetime64[s]'), 'min': empty, 'max': empty,
+                              'mean': empty, 'count': numpy.zeros(0, dtype=int)}
+            continue
+        bucket = seconds // level
+        bucket -= bucket[0]
+        # readings are sorted: each bucket is a contiguous run starting at 'starts'
+        starts = numpy.flatnonzero(numpy.concatenate(([True], bucket[1:] != bucket[:-1])))
+        ids = bucket[starts]
+        nb_buckets = ids[-1] + 1
+        count = numpy.zeros(nb_buckets, dtype=int)
+        count[ids] = numpy.diff(numpy.append(starts, len(bucket)))
+        aggregates = {}
+        for name, reduce in (('min', numpy.minimum), ('max', numpy.maximum), ('mean', numpy.add)):
+            aggregates[name] = numpy.full((len(data), nb_buckets), numpy.nan)
+            aggregates[name][:, ids] = reduce.reduceat(data, starts, axis=1)
+        aggregates['mean'][:, ids] /= count[ids]
+        aggregates['count'] = count
+        aggregates['time'] = ((seconds[0] // level + numpy.arange(nb_buckets)) * level).astype('datetime64[s]')
+        pyramid[level] = aggregates
+    return pyramid
+
+
+def pyramid_filename(filename):
+    return filename + PYRAMID_EXTENSION
+
+
+def read_pyramid(filename):
+    """Return the pyramid stored next to the file, None if missing or older than the file"""
+    sidecar = pyramid_filename(filename)
+    if not path.isfile(sidecar) or path.getmtime(sidecar) < path.getmtime(filename):
+        return None
+    with numpy.load(sidecar) as npz:
+        return {level: {name: npz["%s_%d" % (name, level)] for name in ('time', 'min', 'max', 'mean', 'count')}
+                for level in LEVELS}
+
+
+def write_pyramid(filename, pyramid):
+    """Store the pyramid next to the file, silently skipped on a read only folder"""
+    arrays = {"%s_%d" % (name, level): values for level, aggregates in pyramid.items()
+              for name, values in aggregates.items()}
+    write_sidecar(pyramid_filename(filename), lambda fout: numpy.savez(fout, **arrays))
+
+
+def get_pyramid(sid_file):
+    """Return the pyramid of the SidFile: read from its sidecar, else computed then stored.
+    The pyramid of a partial SidFile (slice or live buffer) is computed in memory only."""
+    if getattr(sid_file, 'pyramid', None) is None:
+        whole_file = sid_file.filename and not sid_file.is_partial and not sid_file.is_live
+        sid_file.pyramid = read_pyramid(sid_file.filename) if whole_file else None
+        if sid_file.pyramid is None:
+            sid_file.pyramid = build_pyramid(sid_file.timestamp, sid_file.data)
+            if whole_file:
+                write_pyramid(sid_file.filename, sid_file.pyramid)
+    return sid_file.pyramid
+
+
+def choose_level(pyramid, nb_pixels):
+    """Return the coarsest level with at least one bucket per pixel, None if the raw readings are needed"""
+    for level in reversed(LEVELS):
+        if len(pyramid[level]['time']) >= nb_pixels:
+            return level
+    return None
+
+
+def minmax_decimate(x, low, high, nb_pixels):
+    """Return (x, y) of the min/max envelope of the series on 'nb_pixels' equal slices:
+    each slice drawn as a vertical segment from its lowest 'low' to its highest 'high' (NaN ignored)"""
+    if len(x) <= nb_pixels:
+        starts = numpy.arange(len(x))
+        lows, highs = low, high
+    else:
+        starts = numpy.unique(numpy.linspace(0, len(x), nb_pixels, endpoint=False).astype(int))
+        lows, highs = numpy.fmin.reduceat(low, starts), numpy.fmax.reduceat(high, starts)
+    return numpy.repeat(x[starts], 2), numpy.column_stack((lows, highs)).ravel()
+
+
+def lttb(x, y, nb_points):
+    """Largest-Triangle-Three-Buckets: return the (x, y) of the 'nb_points' readings keeping the shape of the series.
+    The first and last readings are kept, then in each bucket the reading making the largest triangle with
+    the reading kept in the previous bucket and the average of the next bucket."""
+    if nb_points >= len(y) or nb_points < 3:
+        return x, y
+    xf = (x - x[0]) / numpy.timedelta64(1, 's') if numpy.issubdtype(x.dtype, numpy.datetime64) else x.astype(float)
+    yf = numpy.asarray(y, dtype=float)
+    edges = numpy.linspace(1, len(y) - 1, nb_points - 1).astype(int)
+    edges = numpy.append(edges, len(y))     # the last bucket is the last reading alone
+    # averages of all the buckets computed at once, used as the third point of the triangles
+    sums_x = numpy.add.reduceat(xf, edges[:-1])
+    sums_y = numpy.add.reduceat(yf, edges[:-1])
+    lengths = numpy.diff(edges)
+    average_x, average_y = sums_x / lengths, sums_y / lengths
+    selected = numpy.zeros(nb_points, dtype=int)
+    selected[-1] = len(y) - 1
+    kept = 0
+    for bucket in range(nb_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = numpy.abs((xf[kept] - average_x[bucket + 1]) * (yf[start:end] - yf[kept])
+                          - (xf[kept] - xf[start:end]) * (average_y[bucket + 1] - yf[kept]))
+        kept = start + numpy.argmax(areas)
+        selected[bucket + 1] = kept
+    return x[selected], y[selected]
+
+
+DECIMATIONS = ('minmax', 'lttb', 'none')
+
+
+def plot_series(sid_file, station, nb_pixels, decimation = 'minmax'):
+    """Return the (x, y) to plot the station's readings on 'nb_pixels', at most 2 points per pixel:
+    - minmax: min/max envelope, from the coarsest pyramid level fitting the pixels or else from the raw readings
+    - lttb: the readings (or the pyramid level's means) selected by Largest-Triangle-Three-Buckets
+    - none: all the raw readings"""
+    raw_length = None if sid_file.lazy else len(sid_file.timestamp)
+    if decimation == 'none' or (raw_length is not None and raw_length <= 2 * nb_pixels):
+        return sid_file.timestamp, sid_file.get_station_data(station)
+    pyramid = get_pyramid(sid_file)
+    level = choose_level(pyramid, nb_pixels)
+    if level is None:
+        x = sid_file.timestamp
+        low = high = mean = numpy.asarray(sid_file.get_station_data(station), dtype=float)
+    else:
+        aggregates = pyramid[level]
+        iStation = sid_file.get_station_index(station)
+        x = aggregates['time'] + numpy.timedelta64(level // 2, 's')
+        low, high, mean = aggregates['min'][iStation], aggregates['max'][iStation], aggregates['mean'][iStation]
+    if decimation == 'lttb':
+        recorded = ~numpy.isnan(mean)
+        return lttb(x[recorded], mean[recorded], 2 * nb_pixels)
+    return minmax_decimate(x, low, high, nb_pixels)
@@ -1,117 +1,195 @@
-#!/usr/bin/python
-"""Class SidTimer
-    Define a timer with auto-correction to ensure that data acquisition is done
-    on the 'interval' and as accurately as possible.
-    The auto-correction compensates for the micro-seconds lost from one tick to the next.
-    Implemenation examples are provided at the source's end, which can be used to test the module/class.
-"""
-from __future__ import print_function   # use the new Python 3 'print' function
-import time
-from datetime import datetime 
-import threading
-
-class SidTimer():
-    def __init__(self, interval, callback, delay=0):
-        """Synchronize the timer and start the trigger mechanism.
-            Public properties:
-            - start_time: reference startig time.time() in local time *on the interval* (synchro)
-            - expected_time: theoritical time the trigger should happen as 'start_time + X * interval'
-            - time_now: real time.time() when the trigger happened
-        """
-        self.version = "1.3.1 20130907"
-        self.callback = callback
-        self.interval = interval
-        self.lock = threading.Lock()
-        # wait for synchro on the next 'interval' sec
-        now = time.gmtime() 
-        while now.tm_sec % self.interval != 0:
-            time.sleep(0.05)
-            now = time.gmtime()
-        # request a Timer   
-        self.start_time = int(time.time() / self.interval) * self.interval + delay
-        self.expected_time = self.start_time + self.interval
-        self._timer = threading.Timer(self.expected_time - time.time(), self._ontimer)
-        self._timer.start()
-
-    def _ontimer(self):
-        """Retrigger a timer for the next INTERVAL with adjustment if necessary i.e. running late/fast then perform callback"""
-        self.time_now = time.time()
-        self.utc_now = datetime.utcnow()
-        self._timer = threading.Timer(self.interval + self.expected_time - self.time_now, self._ontimer)
-        self._timer.start()
-        self.data_index = int((self.utc_now.hour * 3600 + self.utc_now.minute * 60 + self.utc_now.second) / self.interval)
-        self.expected_time += self.interval
-        # callback to perform tasks
-        self.callback()
-        
-    def stop(self):
-        """Cancel the timer currently running in background"""
-        self._timer.cancel()
-    
-    def get_utc_now(self):
-        return self.utc_now.strftime("%Y-%m-%d %H:%M:%S.%f")
-
-if __name__ == '__main__':
-    TIME_INTERVAL = 5.0 #seconds
-    TEST_LENGTH = 3600.0 #seconds
-
-    class test_SidTimer_superclass(SidTimer):
-        """Example of SidTimer implementation by extending SidTimer class and inheriting its properties"""
-        def __init__(self, interval):
-            print ("Waiting for synchro...", end='')
-            SidTimer.__init__(self, interval, self.onTimerEvent)
-            print ("done.")
-            self.max_plus_error, self.max_minus_error = 0, 0
-
-
-        def onTimerEvent(self):
-            """Call back function to do tasks when Timer is tiggered.
-                In this test class, only display some tracking on the timer's accuracy
-            """
-            time_error =  self.expected_time - self.time_now - self.interval
-            if time_error > 0 and time_error > self.max_plus_error:
-                self.max_plus_error = time_error
-            elif time_error < 0 and time_error < self.max_minus_error:
-                self.max_minus_error = time_error
-            
-            print ("Idx", self.data_index, "now:", self.time_now, "expec_time:", self.expected_time - self.interval)
-            print (" err:", time_error, "interv: %f" % (self.expected_time - self.time_now))
-
-        def cancel_timer(self):
-            self.stop()
-
-    class test_SidTimer_simple():
-        """Example of SidTimer implementation using a local variable 'sidtimer' to handle the new SidTimer instance"""
-        def __init__(self, interval):
-            print ("Waiting for synchro...",end='')
-            self.sidtimer = SidTimer(interval, self.onTimerEvent)
-            print ("done.")
-            self.max_plus_error, self.max_minus_error = 0, 0
-
-        def onTimerEvent(self):
-            """Call back function to do tasks when Timer is tiggered.
-                In this test class, only display some tracking on the timer's accuracy
-            """
-            time_error =  self.sidtimer.expected_time - self.sidtimer.time_now - self.sidtimer.interval
-            if time_error > 0 and time_error > self.max_plus_error:
-                self.max_plus_error = time_error
-            elif time_error < 0 and time_error < self.max_minus_error:
-                self.max_minus_error = time_error
-
-            print ("Idx", self.sidtimer.data_index, "now:", self.sidtimer.time_now, "expec_time:", self.sidtimer.expected_time - self.sidtimer.interval)
-            print (" err:", time_error, "interv: %f" % (self.sidtimer.expected_time - self.sidtimer.time_now))
-
-        def cancel_timer(self):
-            self.sidtimer.stop()
-
-    # choose either 'test_SidTimer_simple' or 'test_SidTimer_superclass'. Results will be the same.
-    tst = test_SidTimer_simple(TIME_INTERVAL)
-    try:
-        time.sleep(TEST_LENGTH)  # do nothing while testing the timer's accuracy
-    except (KeyboardInterrupt, SystemExit):
-        pass
-
-    # let's cleanup and show max errors
-    tst.cancel_timer()
-    print ("max positive error: ", tst.max_plus_error)
-    print ("max negative error: ", tst.max_minus_error)
+#!/usr/bin/python
+"""Class SidTimer
+    Define a timer with auto-correction to ensure that data acquisition is done
+    on the 'interval' and as accurately as possible.
+    One long-lived thread sleeps until each deadline, measured on time.monotonic(): the callbacks never
+    overlap and wall clock adjustments do not disturb the pace. When a callback runs longer than the
+    interval, the 'overrun' policy decides what to do with the missed ticks:
+    - skip: ticks already late by one interval or more are dropped
+    - catchup: missed ticks are all performed, back to back, with their own data_index
+    - coalesce: missed ticks are merged in one tick performed at once
+    Counters and a histogram of the ticks' lateness are available with get_stats().
+    Implemenation examples are provided at the source's end, which can be used to test the module/class.
+"""
+from __future__ import print_function   # use the new Python 3 'print' function
+import time
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic   # Python 2.7: wall clock, adjustments are not compensated
+from datetime import datetime 
+import threading
+import traceback
+
+SKIP, CATCHUP, COALESCE = 'skip', 'catchup', 'coalesce'
+
+class SidTimer():
+    OVERRUN_POLICIES = (SKIP, CATCHUP, COALESCE)
+    JITTER_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)  # lateness histogram upper bounds in seconds
+    LATE_TICK = 0.1  # a tick performed this many seconds after its deadline is counted as late
+
+    def __init__(self, interval, callback, delay=0, overrun=COALESCE):
+        """Synchronize the timer and start the trigger mechanism.
+            Public properties:
+            - start_time: reference startig time.time() in local time *on the interval* (synchro)
+            - expected_time: theoritical time the trigger should happen as 'start_time + X * interval'
+            - time_now: real time.time() when the trigger happened
+        """
+        self.version = "1.4 20261018"
+        if overrun not in self.OVERRUN_POLICIES:
+            raise ValueError("Unknown overrun policy '%s', expecting one of %s" % (overrun, self.OVERRUN_POLICIES))
+        self.callback = callback
+        self.interval = interval
+        self.overrun = overrun
+        self.lock = threading.Lock()
+        # counters: see get_stats()
+        self.nb_ticks, self.nb_late, self.nb_skipped, self.nb_coalesced, self.nb_caught_up = 0, 0, 0, 0, 0
+        self.max_lateness = 0.0
+        self.jitter_histogram = [0] * (len(self.JITTER_BUCKETS) + 1)
+        # synchro on the current 'interval' boundary: the first trigger happens on the next one
+        self.start_time = int(time.time() / self.interval) * self.interval + delay
+        self.expected_time = self.start_time + self.interval
+        # wall clock is used once to align on the interval, then deadlines live on the monotonic clock
+        self._monotonic_offset = monotonic() - time.time()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SidTimer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        """Wait for each deadline then perform the callback, in this unique thread"""
+        deadline = self.expected_time  # wall time of the next tick, slept against monotonic()
+        while True:
+            wait = deadline + self._monotonic_offset - monotonic()
+            if self._stop_event.wait(max(wait, 0.0)):
+                break
+            lateness = monotonic() - self._monotonic_offset - deadline
+            self._record_lateness(lateness)
+            missed = int(lateness // self.interval)  # number of following deadlines already passed
+            if missed == 0:
+                self._ontimer(deadline + self.interval, datetime.utcnow())
+                deadline += self.interval
+            elif self.overrun == CATCHUP:
+                # perform the late tick as if on time, next loop is immediate for the other missed ticks
+                self.nb_caught_up += 1
+                self._ontimer(deadline + self.interval, datetime.utcfromtimestamp(deadline))
+                deadline += self.interval
+            elif self.overrun == COALESCE:
+                self.nb_coalesced += missed
+                deadline += (missed + 1) * self.interval
+                self._ontimer(deadline, datetime.utcnow())
+            else:  # SKIP
+                self.nb_skipped += missed + 1
+                deadline += (missed + 1) * self.interval
+
+    def _record_lateness(self, lateness):
+        self.nb_ticks += 1
+        self.max_lateness = max(self.max_lateness, lateness)
+        for i, upper_bound in enumerate(self.JITTER_BUCKETS):
+            if lateness < upper_bound:
+                break
+        else:
+            i = len(self.JITTER_BUCKETS)
+        self.jitter_histogram[i] += 1
+        if lateness >= self.LATE_TICK:
+            self.nb_late += 1
+
+    def _ontimer(self, next_time, utc_now):
+        """Set the public properties of this tick then perform callback"""
+        self.time_now = time.time()
+        self.utc_now = utc_now
+        self.data_index = int((self.utc_now.hour * 3600 + self.utc_now.minute * 60 + self.utc_now.second) / self.interval)
+        self.expected_time = next_time
+        # callback to perform tasks
+        try:
+            self.callback()
+        except Exception:
+            print("Error in SidTimer callback at", self.get_utc_now())
+            traceback.print_exc()
+
+    def stop(self):
+        """Cancel the timer currently running in background"""
+        self._stop_event.set()
+        if self._thread is not threading.current_thread():  # stop() can be requested by the callback itself
+            self._thread.join(self.interval)
+
+    def get_utc_now(self):
+        return self.utc_now.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    def get_stats(self):
+        """Return the counters and the lateness histogram as a dictionary"""
+        labels = ["<%gs" % b for b in self.JITTER_BUCKETS] + [">=%gs" % self.JITTER_BUCKETS[-1]]
+        return {'overrun': self.overrun,
+                'ticks': self.nb_ticks,
+                'late': self.nb_late,
+                'skipped': self.nb_skipped,
+                'coalesced': self.nb_coalesced,
+                'caught_up': self.nb_caught_up,
+                'max_lateness': self.max_lateness,
+                'jitter_histogram': list(zip(labels, self.jitter_histogram))}
+
+if __name__ == '__main__':
+    TIME_INTERVAL = 5.0 #seconds
+    TEST_LENGTH = 3600.0 #seconds
+
+    class test_SidTimer_superclass(SidTimer):
+        """Example of SidTimer implementation by extending SidTimer class and inheriting its properties"""
+        def __init__(self, interval):
+            print ("Waiting for synchro...", end='')
+            SidTimer.__init__(self, interval, self.onTimerEvent)
+            print ("done.")
+            self.max_plus_error, self.max_minus_error = 0, 0
+
+
+        def onTimerEvent(self):
+            """Call back function to do tasks when Timer is tiggered.
+                In this test class, only display some tracking on the timer's accuracy
+            """
+            time_error =  self.expected_time - self.time_now - self.interval
+            if time_error > 0 and time_error > self.max_plus_error:
+                self.max_plus_error = time_error
+            elif time_error < 0 and time_error < self.max_minus_error:
+                self.max_minus_error = time_error
+            
+            print ("Idx", self.data_index, "now:", self.time_now, "expec_time:", self.expected_time - self.interval)
+            print (" err:", time_error, "interv: %f" % (self.expected_time - self.time_now))
+
+        def cancel_timer(self):
+            self.stop()
+
+    class test_SidTimer_simple():
+        """Example of SidTimer implementation using a local variable 'sidtimer' to handle the new SidTimer instance"""
+        def __init__(self, interval):
+            print ("Waiting for synchro...",end='')
+            self.sidtimer = SidTimer(interval, self.onTimerEvent)
+            print ("done.")
+            self.max_plus_error, self.max_minus_error = 0, 0
+
+        def onTimerEvent(self):
+            """Call back function to do tasks when Timer is tiggered.
+                In this test class, only display some tracking on the timer's accuracy
+            """
+            time_error =  self.sidtimer.expected_time - self.sidtimer.time_now - self.sidtimer.interval
+            if time_error > 0 and time_error > self.max_plus_error:
+                self.max_plus_error = time_error
+            elif time_error < 0 and time_error < self.max_minus_error:
+                self.max_minus_error = time_error
+
+            print ("Idx", self.sidtimer.data_index, "now:", self.sidtimer.time_now, "expec_time:", self.sidtimer.expected_time - self.sidtimer.interval)
+            print (" err:", time_error, "interv: %f" % (self.sidtimer.expected_time - self.sidtimer.time_now))
+
+        def cancel_timer(self):
+            self.sidtimer.stop()
+
+    # choose either 'test_SidTimer_simple' or 'test_SidTimer_superclass'. Results will be the same.
+    tst = test_SidTimer_simple(TIME_INTERVAL)
+    try:
+        time.sleep(TEST_LENGTH)  # do nothing while testing the timer's accuracy
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+    # let's cleanup and show max errors
+    tst.cancel_timer()
+    print ("max positive error: ", tst.max_plus_error)
+    print ("max negative error: ", tst.max_minus_error)
+    print ("timer statistics: ", tst.sidtimer.get_stats())
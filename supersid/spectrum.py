@@ -0,0 +1,163 @@
+#!/usr/bin/python
+"""
+    spectrum.py
+    DSP engines computing the signal strength of the monitored stations from one capture.
+
+    The historical engine is matplotlib.mlab.psd: a full spectrum is computed then only
+    the 'Sampler.monitored_bins' entries are kept.
+    - SpectrumEngine: same (Pxx, freqs) contract as mlab.psd, numpy only, constants cached
+    The engines below return the same values for the monitored bins only:
+    - Goertzel: a bank of single bin DFT (vectorized Goertzel), one per monitored station
+    - ZoomFFT: narrowband analysis around each station frequency, sub-Hz resolution without a huge NFFT
+
+    The station engines are callables: engine(data) returns one power value per monitored bin.
+"""
+from __future__ import print_function   # use the new Python 3 'print' function
+import threading
+import numpy
+
+
+class SpectrumEngine():
+    """Power Spectral Density as matplotlib.mlab.psd(data, NFFT, Fs) with its default parameters:
+    Hanning window, no detrending, no overlap, one-sided density.
+    The window, scaling and frequency vectors are computed once per (NFFT, Fs) and cached.
+    The capture is cut in NFFT long frames transformed by one 2-D rfft call, in a reused float32 buffer.
+    """
+    _constants = {}  # (NFFT, Fs) -> (window, scale, freqs), shared by all engines
+
+    def __init__(self):
+        self.frames = None  # float32 work buffer, shape (nb_segments, NFFT)
+        self.lock = threading.Lock()  # the work buffer is shared by concurrent ticks
+
+    @classmethod
+    def get_constants(cls, NFFT, Fs):
+        """Return the cached (window, scale, freqs) for this NFFT and sampling frequency"""
+        if (NFFT, Fs) not in cls._constants:
+            window = numpy.hanning(NFFT).astype(numpy.float32)
+            # density scaling, doubled for the one-sided spectrum except at DC and Nyquist bins
+            scale = numpy.full(NFFT // 2 + 1, 2.0 / (Fs * (window.astype(float) ** 2).sum()))
+            scale[0] /= 2.0
+            if NFFT % 2 == 0:
+                scale[-1] /= 2.0
+            freqs = numpy.fft.rfftfreq(NFFT, 1.0 / Fs)
+            cls._constants[(NFFT, Fs)] = (window, scale, freqs)
+        return cls._constants[(NFFT, Fs)]
+
+    def __call__(self, data, NFFT=256, Fs=2):
+        """Return (Pxx, freqs) as mlab.psd does"""
+        window, scale, freqs = self.get_constants(NFFT, Fs)
+        nb_segments = max(1, len(data) // NFFT)  # as mlab.psd, a too short capture is zero padded
+        nb_samples = min(len(data), nb_segments * NFFT)
+        with self.lock:
+            if self.frames is None or self.frames.shape != (nb_segments, NFFT):
+                self.frames = numpy.empty((nb_segments, NFFT), dtype=numpy.float32)
+            flat_frames = self.frames.reshape(-1)
+            flat_frames[:nb_samples] = data[:nb_samples]
+            flat_frames[nb_samples:] = 0.0
+            numpy.multiply(self.frames, window, out=self.frames)
+            spectrum = numpy.fft.rfft(self.frames, axis=1)
+        Pxx = (spectrum.real ** 2 + spectrum.imag ** 2).mean(axis=0, dtype=float) * scale
+        return Pxx, freqs
+
+
+class Goertzel():
+    """Vectorized Goertzel i.e. a DFT computed only at the monitored bins.
+    Results match matplotlib.mlab.psd(data, NFFT, Fs)[0][bins]: same Hanning window,
+    same NFFT long segments without overlap, same one-sided density scaling.
+    """
+    def __init__(self, bins, NFFT, audio_sampling_rate):
+        self.bins = numpy.array(bins, dtype=int)
+        self.NFFT = NFFT
+        window = numpy.hanning(NFFT)
+        # one column per station: window * complex exponential of the station's bin
+        n = numpy.arange(NFFT)
+        self.kernel = window[:, numpy.newaxis] * numpy.exp(-2j * numpy.pi * numpy.outer(n, self.bins) / NFFT)
+        # density scaling, doubled for the one-sided spectrum except at DC and Nyquist bins
+        self.scale = numpy.full(len(self.bins), 2.0 / (audio_sampling_rate * (window ** 2).sum()))
+        self.scale[(self.bins == 0) | (self.bins == NFFT // 2)] /= 2.0
+
+    def __call__(self, data):
+        """Return the power of each monitored bin averaged over all the NFFT segments of 'data'"""
+        data = numpy.asarray(data, dtype=float)
+        if len(data) < self.NFFT:  # as mlab.psd, zero pad a too short capture
+            data = numpy.concatenate((data, numpy.zeros(self.NFFT - len(data))))
+        nb_segments = len(data) // self.NFFT
+        segments = data[:nb_segments * self.NFFT].reshape(nb_segments, self.NFFT)
+        dft = numpy.dot(segments, self.kernel)  # shape: (nb_segments, nb_stations)
+        return (dft.real ** 2 + dft.imag ** 2).mean(axis=0) * self.scale
+
+
+class ZoomFFT():
+    """Zoom FFT around each monitored frequency:
+    the capture is heterodyned to bring the station's frequency to 0 Hz, low-pass filtered and decimated
+    by a polyphase windowed-sinc FIR, then a small FFT is run on the decimated baseband.
+    The resolution is 1 / capture duration: 1 Hz for one second, 0.2 Hz for a 5 seconds continuous capture.
+    'bandwidth' is the band kept around each station by the decimation, 'measure_band' the band measured:
+    - 0 (default): the one-sided density (same unit as mlab.psd, V**2/Hz) of the bin at the station frequency,
+      i.e. over the resolution of the capture instead of a 47 Hz wide NFFT=1024 bin
+    - else the mean density within +/- measure_band/2 around the station frequency, at most MAX_MEASURE_BAND Hz
+    Hence the values are densities over a much narrower band than mlab.psd's bins: not comparable with them.
+    """
+    FIR_BLOCKS = 16  # low-pass filter length in number of decimation blocks
+    MAX_MEASURE_BAND = 5.0  # Hz
+
+    def __init__(self, frequencies, audio_sampling_rate, bandwidth = 100, measure_band = 0.0):
+        self.frequencies = numpy.array(frequencies, dtype=float)
+        self.audio_sampling_rate = audio_sampling_rate
+        self.half_measure = min(measure_band, self.MAX_MEASURE_BAND) / 2.0
+        # decimated sampling rate spans twice the bandwidth to keep the band away from the filter's roll-off
+        self.decimation = max(1, int(audio_sampling_rate // (2 * bandwidth)))
+        self.decimated_rate = audio_sampling_rate / float(self.decimation)
+        # Blackman windowed sinc low-pass cut at bandwidth i.e. half the decimated rate, unity gain at 0 Hz
+        # split in FIR_BLOCKS phases of 'decimation' taps: one matrix product per phase
+        taps = numpy.arange(self.FIR_BLOCKS * self.decimation) - (self.FIR_BLOCKS * self.decimation - 1) / 2.0
+        fir = numpy.sinc(taps / self.decimation) * numpy.blackman(len(taps))
+        self.fir = (fir / fir.sum()).reshape(self.FIR_BLOCKS, self.decimation).astype(numpy.float32)
+        self.oscillators = {}  # capture length -> complex64 array of shape (nb_stations, length)
+        self.freqs, self.spectra = None, None  # last zoomed spectra, offsets from the station frequencies
+
+    def get_oscillators(self, length):
+        """Return the cached local oscillators for a capture of 'length' samples"""
+        if length not in self.oscillators:
+            self.oscillators.clear()  # the capture length rarely changes, keep only the last one
+            t = numpy.arange(length) / float(self.audio_sampling_rate)
+            self.oscillators[length] = numpy.exp(-2j * numpy.pi * numpy.outer(self.frequencies, t)).astype(numpy.complex64)
+        return self.oscillators[length]
+
+    def __call__(self, data):
+        """Return the narrowband density at (or around, see 'measure_band') each monitored frequency"""
+        nb_blocks = len(data) // self.decimation
+        length = nb_blocks * self.decimation
+        nb_decimated = nb_blocks - self.FIR_BLOCKS + 1
+        if nb_decimated < 2:
+            return numpy.zeros(len(self.frequencies))
+        baseband = self.get_oscillators(length) * numpy.asarray(data[:length], dtype=numpy.float32)
+        blocks = baseband.reshape(len(self.frequencies), nb_blocks, self.decimation)
+        decimated = numpy.zeros((len(self.frequencies), nb_decimated), dtype=numpy.complex64)
+        for phase in range(self.FIR_BLOCKS):
+            decimated += numpy.dot(blocks[:, phase:phase + nb_decimated, :], self.fir[phase])
+        window = numpy.hanning(nb_decimated)
+        spectrum = numpy.fft.fftshift(numpy.fft.fft(decimated * window, axis=1), axes=1)
+        self.freqs = numpy.fft.fftshift(numpy.fft.fftfreq(nb_decimated, 1.0 / self.decimated_rate))
+        # complex baseband is two-sided: double it to compare with the one-sided mlab.psd density
+        self.spectra = (spectrum.real ** 2 + spectrum.imag ** 2) * (2.0 / (self.decimated_rate * (window ** 2).sum()))
+        nearest = numpy.argmin(numpy.abs(self.freqs))  # the bin of the station frequency
+        in_band = numpy.abs(self.freqs) <= self.half_measure
+        if self.half_measure == 0.0 or in_band.sum() <= 1:
+            return self.spectra[:, nearest]
+        return self.spectra[:, in_band].mean(axis=1)
+
+
+if __name__ == '__main__':
+    # compare the engines with matplotlib.mlab.psd on a noisy signal with 2 carriers
+    from matplotlib.mlab import psd as mlab_psd
+    Fs, NFFT = 48000, 1024
+    t = numpy.arange(Fs) / float(Fs)
+    data = numpy.sin(2 * numpy.pi * 19800 * t) + 0.5 * numpy.sin(2 * numpy.pi * 18200 * t) + numpy.random.randn(Fs)
+    bins = [int(f * NFFT / Fs) for f in (0, 18200, 19800, 24000)]
+    Pxx, freqs = mlab_psd(data, NFFT, Fs)
+    print("mlab.psd:", Pxx[bins])
+    Pxx, freqs = SpectrumEngine()(data, NFFT, Fs)
+    print("numpy   :", Pxx[bins])
+    print("Goertzel:", Goertzel(bins, NFFT, Fs)(data))
+    print("Zoom FFT:", ZoomFFT((18200, 19800), Fs)(data), "for 18200 and 19800 Hz")
@@ -19,14 +19,19 @@ from __future__ import print_function   # use the new Python 3 'print' function
 import os.path
 import argparse
 
-# matplotlib ONLY used in Controller for its PSD function, not for any graphic
-from matplotlib.mlab import psd as mlab_psd
+# matplotlib ONLY used in Controller for its PSD function when 'psd_engine = mlab', not for any graphic
+# optional: a headless monitor can run without matplotlib using the 'numpy' or 'goertzel' psd_engine
+try:
+    from matplotlib.mlab import psd as mlab_psd
+except ImportError:
+    mlab_psd = None
 
 # SuperSID Package classes
 from sidtimer import SidTimer
 from sampler import Sampler
 from config import Config
 from logger import Logger
+from spectrum import SpectrumEngine, Goertzel, ZoomFFT
 
 class SuperSID():
     '''
@@ -40,6 +45,7 @@ class SuperSID():
         self.timer = None
         self.sampler = None
         self.viewer = None
+        self.logger = None
 
         # Read Config file here
         print("Reading supersid.cfg ...", end='')
@@ -85,11 +91,20 @@ class SuperSID():
             exit(2)
 
         # Assign desired psd function for calculation after capture
-        # currently: using matplotlib's psd
-        if (self.config['viewer'] == 'wx' and wx_imported) or self.config['viewer'] == 'tk':
+        # currently: using the viewer's matplotlib psd in graphic mode, else the .cfg 'psd_engine'
+        # 'station_psd' engines compute the monitored stations' power only, no full spectrum to draw
+        self.station_psd = None
+        graphic_psd = (self.config['viewer'] == 'wx' and wx_imported) or self.config['viewer'] == 'tk'
+        self.display_psd = graphic_psd and self.config['psd_engine'] == 'zoom'  # full spectrum for display only
+        if graphic_psd:
             self.psd = self.viewer.get_psd  # calculate psd and draw result in one call
-        else:
+        elif self.config['psd_engine'] == 'mlab':
             self.psd = mlab_psd             # calculation only
+            if self.psd is None:
+                print("ERROR: matplotlib is not installed. Please set 'psd_engine = numpy' in the .cfg file.")
+                exit(4)
+        else:
+            self.psd = SpectrumEngine()     # calculation only, numpy implementation of mlab's psd
 
         # calculate Stations' buffer_size
         self.buffer_size = int(24*60*60 / self.config['log_interval'])
@@ -101,6 +116,11 @@ class SuperSID():
             exit(3)
         else:
             self.sampler.set_monitored_frequencies(self.config.stations);
+            if self.config['psd_engine'] == 'goertzel' and not graphic_psd:
+                self.station_psd = Goertzel(self.sampler.monitored_bins, self.sampler.NFFT, self.sampler.audio_sampling_rate)
+            elif self.config['psd_engine'] == 'zoom':
+                self.station_psd = ZoomFFT(self.sampler.monitored_frequencies, self.sampler.audio_sampling_rate,
+                                           self.config['zoom_bandwidth'], self.config['zoom_measure'])
 
         # Link the logger.sid_file.data buffers to the config.stations
         for ibuffer, station  in enumerate(self.config.stations):
@@ -108,7 +128,7 @@ class SuperSID():
 
         # Create Timer
         self.viewer.status_display("Waiting for Timer ... ")
-        self.timer = SidTimer(self.config['log_interval'], self.on_timer)
+        self.timer = SidTimer(self.config['log_interval'], self.on_timer, overrun=self.config['timer_overrun'])
 
 
     def clear_all_data_buffers(self):
@@ -126,10 +146,18 @@ class SuperSID():
         self.viewer.status_display(message, level=1)
         signal_strengths = []
         try:
-            data = self.sampler.capture_1sec()  # return a list of 1 second signal strength
-            Pxx, freqs = self.psd(data, self.sampler.NFFT, self.sampler.audio_sampling_rate)
-            for binSample in self.sampler.monitored_bins:
-                signal_strengths.append(Pxx[binSample])
+            data = self.sampler.capture()  # return 1 second of signal, or 'log_interval' seconds in continuous mode
+            if len(data) == 0:  # capture failed or sampler not ready: no reading for this tick
+                if not self.sampler.sampler_ok:
+                    self.viewer.status_display("Capture device failed: check the sound card.", level=1)
+            elif self.station_psd:
+                if self.display_psd:
+                    self.psd(data, self.sampler.NFFT, self.sampler.audio_sampling_rate)  # draw the spectrum
+                signal_strengths = list(self.station_psd(data))
+            else:
+                Pxx, freqs = self.psd(data, self.sampler.NFFT, self.sampler.audio_sampling_rate)
+                for binSample in self.sampler.monitored_bins:
+                    signal_strengths.append(Pxx[binSample])
         except IndexError as idxerr:
             print("Index Error:", idxerr)
             print("Data len:", len(data))
@@ -139,39 +167,46 @@ class SuperSID():
         # ensure that one thread at the time accesses the sid_file's' buffers
         with self.timer.lock:
             # do we need to save some files (hourly) or switch to a new day?
+            # files are written in the background from a snapshot of the buffers: the tick does not wait
             if self.timer.utc_now.minute == 0 and self.timer.utc_now.second < self.config['log_interval']:
-                if self.config['hourly_save'] == 'YES':
-                    fileName = "hourly_current_buffers.raw.ext.%s.csv" % (self.logger.sid_file.sid_params['utc_starttime'][:10])
-                    self.save_current_buffers(filename=fileName, log_type='raw', log_format='supersid_extended')
+                snapshot = self.logger.sid_file.snapshot()
+                # the journal already holds every tick: no need to rewrite the day every hour
+                if self.config['hourly_save'] == 'YES' and not self.logger.journal:
+                    fileName = "hourly_current_buffers.raw.ext.%s.csv" % (snapshot.sid_params['utc_starttime'][:10])
+                    self.logger.save_buffers_async(snapshot, self.config.stations, filename=fileName,
+                                                   log_type='raw', log_format='supersid_extended')
                 # a new day!
                 if self.timer.utc_now.hour == 0:
                     # use log_type and log_format(s) requested by the user in the .cfg
-                    for log_format in self.config['log_format'].split(','):
-                        self.save_current_buffers(log_type=self.config['log_type'], log_format=log_format)
+                    futures = [self.logger.save_buffers_async(snapshot, self.config.stations,
+                                                              log_type=self.config['log_type'], log_format=log_format)
+                               for log_format in self.config['log_format'].split(',')]
                     self.clear_all_data_buffers()
-            # Save signal strengths into memory buffers ; prepare message for status bar
+                    if self.logger.journal:
+                        self.logger.rotate_journal(futures)
+            # Save signal strengths into memory buffers, filtered buffers follow ; prepare message for status bar
+            self.logger.sid_file.record_tick(current_index, utc_now, signal_strengths)
             message = self.timer.get_utc_now() + "  [%d]  " % current_index
             for station, strength in zip(self.config.stations, signal_strengths):
-                station['raw_buffer'][current_index] = strength
                 message +=  station['call_sign'] + "=%f " % strength
-            self.logger.sid_file.timestamp[current_index] = utc_now
+            if self.logger.journal and len(signal_strengths) == len(self.config.stations):
+                self.logger.journal.append(current_index, utc_now, signal_strengths)
 
         # end of this thread/need to handle to View to display captured data & message
         self.viewer.status_display(message, level=2)
 
-    def save_current_buffers(self, filename='', log_type='raw', log_format = 'both'):
+    def save_current_buffers(self, filename='', log_type='raw', log_format = 'both', asynchronous = False):
         ''' Save buffer data from logger.sid_file
 
             log_type = raw or filtered
-            log_format = sid_format|sid_extended|supersid_format|supersid_extended|both|both_extended'''
-        filenames = []
-        if log_format.startswith('both') or log_format.startswith('sid'):
-            fnames = self.logger.log_sid_format(self.config.stations, '', log_type=log_type, extended=log_format.endswith('extended')) # filename is '' to ensure one file per station
-            filenames += fnames
-        if log_format.startswith('both') or log_format.startswith('supersid'):
-            fnames = self.logger.log_supersid_format(self.config.stations, filename, log_type=log_type, extended=log_format.endswith('extended'))
-            filenames += fnames
-        return filenames
+            log_format = sid_format|sid_extended|supersid_format|supersid_extended|both|both_extended|binary_format
+            Return the list of file names, or a Future of that list if 'asynchronous' is True'''
+        # the snapshot is taken under the lock: on_timer never modifies the buffers while they are copied
+        with self.timer.lock:
+            snapshot = self.logger.sid_file.snapshot()
+        future = self.logger.save_buffers_async(snapshot, self.config.stations, filename,
+                                                log_type=log_type, log_format=log_format)
+        return future if asynchronous else future.result()
 
     def on_close(self):
         self.close()
@@ -188,6 +223,8 @@ class SuperSID():
             self.sampler.close()
         if self.timer:
             self.timer.stop()
+        if self.logger:
+            self.logger.close()
         if self.viewer:
             self.viewer.close()
 
@@ -15,13 +15,22 @@
 from __future__ import print_function   # use the new Python 3 'print' function
 import sys
 import datetime, time
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter   # Python 2.7
 import itertools
+import functools
 import os.path
 import glob
+from concurrent.futures import ProcessPoolExecutor
+import numpy
 # matplolib tools
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter as ff
 from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import matplotlib.dates
 # Internet and Email modules
 import smtplib
@@ -36,7 +45,10 @@ from email.mime.base import MIMEBase
 from email import encoders, utils
 import argparse
 # SuperSID modules
-from sidfile import SidFile
+from sidfile import SidFile, split_sid_extension, find_sid_file
+from siddataset import SidDataset
+from sidpyramid import plot_series, DECIMATIONS
+from plotcache import PlotCache
 from config import Config
 
 def sendMail(config, To_mail, msgBody, PDFfile):
@@ -79,6 +91,64 @@ def sendMail(config, To_mail, msgBody, PDFfile):
     s.close()
     print ("Email to %s sent." % To_mail)
 
+def expand_filelist(filelist):
+    """Return the list of file names given as 'file1,file2,...,fileN' or as a list, wildcards accepted"""
+    if type(filelist) is str:
+        if filelist.find(',') >= 0:  # file1,file2,...,fileN given as script argument
+            filelist = filelist.split(",")
+        else:
+            filelist = (filelist, )
+    # use glob for one or more files
+    return [a for a in itertools.chain.from_iterable([glob.glob(os.path.expanduser(f)) for f in filelist])]
+
+REPORT_COLORS = "brgcmy"   # report: color of the station by its rank in the file, the same on the page and its thumbnail
+PAGE_SIZE = (29.7 / 2.54, 21.0 / 2.54)  # A4 landscape page in inches
+REPORT_DPI = 100           # report: resolution used to decimate the curves to the page width
+NOAA_PENDING_DAYS = 1      # NOAA may still add flares to the lists of today and of the last days
+
+def noaa_pending(filenames):
+    """Return True if one of the files is recent enough for NOAA to add more flares to its day (UTC)"""
+    last_final_day = (datetime.datetime.utcnow() - datetime.timedelta(days=NOAA_PENDING_DAYS + 1)).strftime("%Y-%m-%d")
+    for filename in filenames:
+        try:
+            day = SidFile(filename, lazy = True).sid_params['utc_starttime'][:10]
+        except (Exception, SystemExit):  # unreadable here: it will be reported by the plot itself
+            return True
+        if day > last_final_day:
+            return True
+    return False
+
+def read_report_pages(filename, nb_pixels, decimation, time_range, per_station, thumbnail_prefix):
+    """Process pool worker: read one file and return (is_live, the list of its report pages),
+    one page per file or per station: (title, start time, [(station, color, x, y)]) decimated to nb_pixels.
+    The PNG thumbnail of each page is saved as '<thumbnail_prefix>_<title>.png' if thumbnail_prefix is given."""
+    sFile = SidFile(filename, lazy = True)
+    if sFile.is_live:  # live buffer: only the readings already written
+        sFile = sFile.live_view()
+    if time_range:  # only the rows of the time range are read
+        sFile = sFile.slice(*time_range)
+        if len(sFile.timestamp) == 0:
+            return sFile.is_live, []
+    title = split_sid_extension(os.path.basename(filename))[0]
+    curves = [(station, REPORT_COLORS[iStation % len(REPORT_COLORS)]) + tuple(plot_series(sFile, station, nb_pixels, decimation))
+              for iStation, station in enumerate(sFile.stations)]
+    if per_station and len(curves) > 1:
+        pages = [(title + " " + curve[0], sFile.startTime, [curve]) for curve in curves]
+    else:
+        pages = [(title, sFile.startTime, curves)]
+    if thumbnail_prefix:
+        for page_title, startTime, page_curves in pages:
+            fig = Figure(figsize=(4.0, 2.0), dpi=75)  # object API: no pyplot state in the worker
+            FigureCanvasAgg(fig)
+            axes = fig.add_subplot(111)
+            for station, color, x, y in page_curves:
+                axes.plot(x, y, color + '-', linewidth=0.5)
+            axes.set_title(page_title, fontsize=8)
+            axes.set_xticks([])
+            axes.tick_params(labelsize=6)
+            fig.savefig("%s_%s.png" % (thumbnail_prefix, page_title.replace(" ", "_")))
+    return sFile.is_live, pages
+
 class SUPERSID_PLOT():
     def m2hm(self, x, i):
         """Small function to format the time on horizontal axis - minor ticks"""
@@ -95,9 +165,12 @@ class SUPERSID_PLOT():
         d = t.day
         return '%(y)04d-%(m)02d-%(d)02d --' % {'y':y,'m':m, 'd': d}
 
-    def plot_filelist(self, filelist, showPlot = True, eMail=None, pdf=None, web=False, config=None):
+    def plot_filelist(self, filelist, showPlot = True, eMail=None, pdf=None, web=False, config=None, time_range=None,
+                      decimation='minmax', cache=None):
         """Read the files in the filelist parameters.
-           Each data are combine in one plot.
+           Each data are combine in one plot, limited to the (start, end) time_range if given.
+           Each curve is decimated to the page's width (minmax, lttb or none: see sidpyramid.plot_series).
+           With a PlotCache, the decimated curves and the PDF are reused while the files do not change.
            That plot can be displayed or not (showPlot), sent by email (eMail provided), saved as pdf (pdf provided).
            Connection for the given days to NOAA website is possible (web) in order to draw vetical lines for XRA data."""
         emailText = []
@@ -109,16 +182,18 @@ class SUPERSID_PLOT():
         #plt.axvspan(0.0, sun_rise, facecolor='blue', alpha=0.2)
         #plt.axvspan(sun_set, 24.0, facecolor='blue', alpha=0.2)
 
-        if type(filelist) is str:
-            if filelist.find(',') >= 0:  # file1,file2,...,fileN given as script argument
-                filelist = filelist.split(",")
-            else:
-                filelist = (filelist, )
-        filenames = []
-        # use glob for one or more files
-        filenames.extend([a for a in itertools.chain.from_iterable(
-                [glob.glob(os.path.expanduser(f)) for f in filelist])  ])
+        filenames = expand_filelist(filelist)
         #print (filenames)
+        # NOAA still adds flares of today and yesterday: such a plot is not cached
+        cache_pdf = cache and pdf and not (web and noaa_pending(filenames))
+        if cache_pdf:
+            cache_key = PlotCache.make_key(filenames, output='plot', web=web, time_range=time_range, decimation=decimation,
+                                           page_size=PAGE_SIZE, dpi=plt.rcParams['figure.dpi'],
+                                           savefig_dpi=plt.rcParams['savefig.dpi'], matplotlib=matplotlib.__version__)
+            if not showPlot and cache.fetch(cache_key, '.pdf', pdf):
+                print ("Plot of", len(filenames), "file(s) found in cache.")
+                if eMail: sendMail(config, eMail, "Plot of " + ", ".join(filenames), pdf)
+                return
 
         # plot's figure and axis
         fig = plt.figure()
@@ -140,21 +215,40 @@ class SUPERSID_PLOT():
         colorStation = {}
         colorIdx = 0
 
-        time.clock()
+        # pixels available for one file: the page width (see the figure size below, one A4 page or a poster
+        # half an A4 page wide per day) shared by all the files, as Plot_Gui.nb_pixels: enough points to plot
+        nb_files = max(1, len(filenames))
+        page_width = PAGE_SIZE[0] * (1 if nb_files == 1 else nb_files / 2.0)
+        nb_pixels = max(1, int(page_width * fig.dpi / nb_files))
+
+        t_start = perf_counter()
+        has_live_file = False
         for filename in sorted(filenames):
-            figTitle.append(os.path.basename(filename)[:-4]) # extension .csv assumed
-            sFile = SidFile(filename)
+            sFile = SidFile(filename, lazy = True)  # the data are not read if the pyramid's sidecar is enough
+            if sFile.is_live:  # live buffer: only the readings already written
+                sFile = sFile.live_view()
+                has_live_file = True
+            if time_range:  # only the rows of the time range are read
+                sFile = sFile.slice(*time_range)
+                if len(sFile.timestamp) == 0:
+                    continue
+            figTitle.append(split_sid_extension(os.path.basename(filename))[0]) # extension .csv, .csv.gz or .sidb removed
             for station in sFile.stations:
                 # Does this station already have a color? if not, reserve one
                 if station not in colorStation:
                     colorStation[station] = colorList[colorIdx % len(colorList)] + '-'  # format like 'b-'
                     colorIdx += 1
-                # Add points to the plot
-                plt.plot_date(sFile.timestamp, sFile.get_station_data(station), colorStation[station])
+                # Add points to the plot: decimated to the page's width
+                if cache:
+                    x, y = cache.cached_plot_series(sFile, station, nb_pixels, decimation, time_range)
+                else:
+                    x, y = plot_series(sFile, station, nb_pixels, decimation)
+                plt.plot(x, y, colorStation[station])
                 # Extra housekeeping
-                maxData = max(max(sFile.get_station_data(station)), maxData)  # maxData will be used later to put the XRA labels up
+                if len(y):
+                    maxData = max(numpy.nanmax(y), maxData)  # maxData will be used later to put the XRA labels up
                 #msg = str(len(sFile.get_station_data(station))) + " points plotted after reading " + os.path.basename(filename)
-                msg = "[{}] {} points plotted after reading {}".format(station, len(sFile.get_station_data(station)), os.path.basename(filename))
+                msg = "[{}] {} points plotted after reading {}".format(station, len(y), os.path.basename(filename))
                 print (msg)
                 emailText.append(msg)
 
@@ -208,7 +302,7 @@ class SUPERSID_PLOT():
                 # keep track of the days
                 daysList.add(sFile.startTime)
 
-        print ("All files read in", time.clock(), "sec.")
+        print ("All files read in %.3f sec." % (perf_counter() - t_start))
 
         if web: # add the lines marking the retrieved flares from NOAA
             alternate = 0
@@ -222,9 +316,9 @@ class SUPERSID_PLOT():
 
         # plot/page size / figure size with on A4 paper
         if len(daysList) == 1:
-            fig.set_size_inches(29.7 / 2.54, 21.0 / 2.54, forward=True)
+            fig.set_size_inches(*PAGE_SIZE, forward=True)
         else:  # allow PDF poster for many days (monthly graph) --> use Adobe PDF Reader --> Print --> Poster mode
-            fig.set_size_inches((29.7 / 2.54) * (len(daysList)/2.0), (21.0 / 2.54) / 2.0, forward=True)
+            fig.set_size_inches(PAGE_SIZE[0] * (len(daysList)/2.0), PAGE_SIZE[1] / 2.0, forward=True)
         fig.subplots_adjust(bottom=0.08, left = 0.05, right = 0.98, top=0.95)
 
         # some cosmetics on the figure
@@ -248,24 +342,86 @@ class SUPERSID_PLOT():
             pp = PdfPages(pdf or 'Image.pdf')  # in case option eMail is given but not pdf
             plt.savefig(pp, format='pdf')
             pp.close()
+            if cache_pdf and not has_live_file:  # a live buffer changes at every reading
+                cache.put(cache_key, '.pdf', pdf)
         if showPlot: plt.show()
         if eMail: sendMail(config, eMail, "\n".join(emailText), pdf or 'Image.pdf')
 
 
+    def plot_report(self, filelist, pdf, eMail=None, config=None, time_range=None, decimation='minmax',
+                    per_station=False, thumbnails=False, jobs=None, cache=None):
+        """Write a multi-page PDF report: one page per file (i.e. per day) or per station and file.
+           The files are read and decimated, and the optional PNG thumbnails drawn, by a pool of 'jobs' processes
+           (default: one per CPU) ; the vector pages are then drawn in the files' order by this process.
+           With a PlotCache, a report without thumbnails is reused while the files do not change."""
+        t_start = perf_counter()
+        filenames = sorted(expand_filelist(filelist))
+        if cache:
+            cache_key = PlotCache.make_key(filenames, output='report', time_range=time_range, decimation=decimation,
+                                           per_station=per_station, page_size=PAGE_SIZE, dpi=REPORT_DPI,
+                                           savefig_dpi=plt.rcParams['savefig.dpi'], matplotlib=matplotlib.__version__)
+            if not thumbnails and cache.fetch(cache_key, '.pdf', pdf):
+                print ("Report of %d file(s) found in cache." % len(filenames))
+                if eMail: sendMail(config, eMail, "Report of " + ", ".join(filenames), pdf)
+                return
+        nb_pixels = int(PAGE_SIZE[0] * REPORT_DPI)  # A4 landscape page
+        thumbnail_prefix = os.path.splitext(pdf)[0] if thumbnails else None
+        emailText = []
+        read_pages = functools.partial(read_report_pages, nb_pixels=nb_pixels, decimation=decimation,
+                                       time_range=time_range, per_station=per_station, thumbnail_prefix=thumbnail_prefix)
+        has_live_file = False
+        with ProcessPoolExecutor(max_workers=jobs) as executor, PdfPages(pdf) as pp:
+            # map() returns the pages in the order of the files while the pool reads the next ones
+            for filename, (is_live, pages) in zip(filenames, executor.map(read_pages, filenames)):
+                has_live_file = has_live_file or is_live
+                for title, startTime, curves in pages:
+                    fig = plt.figure(figsize=PAGE_SIZE)
+                    current_axes = fig.gca()
+                    current_axes.xaxis.set_minor_locator(matplotlib.dates.HourLocator())
+                    current_axes.xaxis.set_major_locator(matplotlib.dates.DayLocator())
+                    current_axes.xaxis.set_major_formatter(ff(self.m2yyyymmdd))
+                    current_axes.xaxis.set_minor_formatter(ff(self.m2hm))
+                    current_axes.set_xlabel("UTC Time")
+                    current_axes.set_ylabel("Signal Strength")
+                    xLegend = 0.03
+                    for station, color, x, y in curves:
+                        current_axes.plot(x, y, color + '-')
+                        fig.text(xLegend, 0.93, station, color=color, fontsize=12, bbox={'fc':"w", 'pad':10, 'ec':color})
+                        xLegend += 0.05
+                    for label in current_axes.xaxis.get_majorticklabels():
+                        label.set_fontsize(8)
+                        label.set_rotation(30)
+                    fig.subplots_adjust(bottom=0.08, left = 0.05, right = 0.98, top=0.88)
+                    fig.suptitle(title)
+                    pp.savefig(fig)
+                    plt.close(fig)
+                msg = "{} page(s) for {}".format(len(pages), os.path.basename(filename))
+                print (msg)
+                emailText.append(msg)
+        print ("Report of %d file(s) written in %.3f sec." % (len(filenames), perf_counter() - t_start))
+        if cache and not has_live_file:  # a live buffer changes at every reading
+            cache.put(cache_key, '.pdf', pdf)
+        if eMail: sendMail(config, eMail, "\n".join(emailText), pdf)
+
+
 #-------------------------------------------------------------------------------
 '''
 For running supersid_plot.py directly from command line
 '''
 
-def do_main(filelist, showPlot = True, eMail=None, pdf=None, web=False, config=None):
+def do_main(filelist, showPlot = True, eMail=None, pdf=None, web=False, config=None, time_range=None, decimation='minmax',
+            cache=None):
+    if not showPlot:  # batch mode: no window, render off screen
+        plt.switch_backend('Agg')
     ssp = SUPERSID_PLOT()
-    ssp.plot_filelist(filelist, showPlot, eMail, pdf, web, config);
+    ssp.plot_filelist(filelist, showPlot, eMail, pdf, web, config, time_range, decimation, cache);
 
 if __name__ == '__main__':
     filenames = ""
     parser = argparse.ArgumentParser(description="""Usage:   supersid_plot.py  filename.csv\n
      Usage:   supersid_plot.py  "filename1.csv,filename2.csv,filename3.csv"\n
      Usage:   supersid_plot.py  "filename*.csv"\n
+     Compressed files are accepted: "filename*.csv*" for .csv.gz, .csv.bz2, .csv.xz\n
      Note: " are optional on Windows, mandatory on *nix\n
      Other options:  supersid_plot.py -h\n""")
     parser.add_argument("-c", "--config", dest="cfg_filename", required=False, default='',
@@ -292,6 +448,26 @@ if __name__ == '__main__':
               help="Site ID to use in the file name", metavar="SITE_ID")
     parser.add_argument("-s", "--station", dest="station_id",
               help="Station ID to use in the file name or * for all", metavar="STAID")
+    parser.add_argument("--from", dest="start_time",
+              help="Plot only from this UTC time", metavar="'YYYY-MM-DD HH:MM'")
+    parser.add_argument("--to", dest="end_time",
+              help="Plot only up to this UTC time", metavar="'YYYY-MM-DD HH:MM'")
+    parser.add_argument("-d", "--decimation", dest="decimation", choices=DECIMATIONS, default='minmax',
+              help="Points plotted per pixel: min/max envelope (default), Largest-Triangle-Three-Buckets or all the readings")
+    parser.add_argument("-r", "--report",
+              action="store_true", dest="report", default=False,
+              help="Write a multi-page report in the PDF file (-p): one page per file, the files read in parallel.")
+    parser.add_argument("--per_station",
+              action="store_true", dest="per_station", default=False,
+              help="Report: one page per station and file.")
+    parser.add_argument("--thumbnails",
+              action="store_true", dest="thumbnails", default=False,
+              help="Report: save a PNG thumbnail of each page next to the PDF file.")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int,
+              help="Report: number of processes reading the files, default one per CPU.")
+    parser.add_argument("--cache", dest="cache_path",
+              help="Folder caching the plots and decimated curves, default 'plot_cache' of the configuration file",
+              metavar="FOLDER")
     parser.add_argument("-v", "--verbose",
               action="store_true", dest="verbose", default=False,
               help="Print more messages.")
@@ -312,6 +488,11 @@ if __name__ == '__main__':
     if args.filename is None: # no --file option specified
         if len(unk) > 0:  # last non options arguments are assumed to be a list of file names
             filenames = ",".join(unk)
+        elif args.start_time and args.end_time:
+            # all the files of data_path holding readings of the time range, found by the dataset
+            dataset = SidDataset(config.get("data_path", None) or "../Data")
+            filenames = ",".join(dataset.files_for(args.start_time, args.end_time,
+                                                   args.station_id.split(",") if args.station_id not in (None, '*') else None))
         else:
             # try building the file name from given options or found in the provided .cfg file
             Now = datetime.datetime.now() # by default today
@@ -321,10 +502,10 @@ if __name__ == '__main__':
             lstFileNames = []
             data_path = config.get("data_path", None) or "../Data"
             if args.station_id is None:  # file name like supersid file format
-                lstFileNames.append("%s/%s_%04d-%02d-%02d.csv" % 
+                lstFileNames.append(find_sid_file("%s/%s_%04d-%02d-%02d.csv" %
                                     (data_path,
                                      args.site_id or config["site_name"],
-                                     Now.year,Now.month,Now.day))
+                                     Now.year,Now.month,Now.day)))
             else:
                 if args.station_id == '*': # all possible stations from .cfg file - must be '*' on the command line!
                     strStations = ",".join([s["call_sign"] for s in config.stations])
@@ -332,10 +513,10 @@ if __name__ == '__main__':
                     strStations = args.station_id
                 # build the list of sid format file names
                 for station in strStations.split(","):
-                    lstFileNames.append("%s/%s_%s_%04d-%02d-%02d.csv" % 
+                    lstFileNames.append(find_sid_file("%s/%s_%s_%04d-%02d-%02d.csv" %
                                         (data_path,
                                          args.site_id or config["site_name"],
-                                         station, Now.year,Now.month,Now.day))
+                                         station, Now.year,Now.month,Now.day)))
             filenames = ",".join(lstFileNames)
     else:
         filenames = args.filename
@@ -343,13 +524,33 @@ if __name__ == '__main__':
     if args.verbose:
         print("List of files:", filenames)
 
-    if filenames:
+    cache_path = args.cache_path or config.get("plot_cache", None)
+    cache = PlotCache(cache_path, config.get("plot_cache_size", 100) * 1024 * 1024) if cache_path else None
+    time_range = (numpy.datetime64(args.start_time or "1970-01-01"), numpy.datetime64(args.end_time or "2100-01-01")) \
+                 if args.start_time or args.end_time else None
+    if filenames and args.report:
+        if not args.pdffilename:
+            parser.error("A report needs a PDF file name: -p filename.PDF")
+        plt.switch_backend('Agg')
+        SUPERSID_PLOT().plot_report(filenames, args.pdffilename,
+                                    eMail=args.email or config.get("to_mail", None),
+                                    config=config,
+                                    time_range=time_range,
+                                    decimation=args.decimation,
+                                    per_station=args.per_station,
+                                    thumbnails=args.thumbnails,
+                                    jobs=args.jobs,
+                                    cache=cache)
+    elif filenames:
         do_main(filenames,
                 showPlot = args.showPlot,
                 eMail=args.email or config.get("to_mail", None),
                 pdf=args.pdffilename,
                 web = args.webData,
-                config=config)
+                config=config,
+                time_range = time_range,
+                decimation = args.decimation,
+                cache = cache)
     else:
         parser.error("No file to plot found.")
 
@@ -13,15 +13,21 @@
 """
 import os.path
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk
+import numpy
 import matplotlib
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg as FigureCanvas, NavigationToolbar2Tk
 from matplotlib.figure import Figure
 from matplotlib.ticker import FuncFormatter as ff
 import ephem
 
-from sidfile import SidFile
+from sidfile import SidFile, split_sid_extension
+from sidpyramid import plot_series
+from plotcache import PlotCache
+from config import Config
 from noaa_flares import NOAA_flares
 
 
@@ -45,7 +51,10 @@ def m2yyyymmdd(x, i):
 class Plot_Gui(ttk.Frame):
     """Supersid Plot GUI in tk"""
     COLOR = {'b': "blue", 'r': "red", 'g': "green", 'c': "cyan", 'm': "magenta", 'y': "yellow"}
-    def __init__(self, parent, file_list, *args, **kwargs):
+    NB_WORKERS = 4        # threads reading the files
+    POLL_DELAY = 100      # ms between two checks of the background jobs
+    DETAIL_DELAY = 300    # ms without zoom/pan before reading the details of the visible range
+    def __init__(self, parent, file_list, cache=None, *args, **kwargs):
         ttk.Frame.__init__(self, parent, *args, **kwargs)
         matplotlib.use('TkAgg')
         self.version = "1.0 20170902 (tk)"
@@ -53,15 +62,20 @@ class Plot_Gui(ttk.Frame):
         self.hidden_stations = set()  # hide the graph if the station is in this set
         self.colorStation = {}        # the color assigned to a station in the graph
         self.sid_files = []           # ordered list of sid files read for the graph
+        self.cache = cache            # PlotCache of the decimated curves, optional
+        self.lines = {}               # (file name, station) -> its curve, shown or hidden by the station's button
+        self.flares = {}              # file name -> its NOAA flares' (lines, label), shown or hidden by 'NOAA'
+        self.noaa_active = False      # 'NOAA' clicked: the flares are shown, fetched for the files read later too
+        self.noaa_fetching = set()    # days whose flares are being fetched from NOAA in the background
+        self.background = None        # graph without the curves and flares, restored before blitting them
         self.init_gui(file_list)
 
     def init_gui(self, file_list):
-        """Builds GUI."""
+        """Builds GUI: shown at once, the files are read in the background and drawn as soon as read."""
         self.tk_root.title('SuperSID Plot')
-        color_list = "".join(self.COLOR) # one color per station
-        color_idx = 0
-        self.daysList = {} # date of NOAA's data already retrieved, prevent multiple fetch
-        fig_title = []    # list of file names (w/o path and extension) as figure's title
+        self.color_idx = 0
+        self.daysList = {} # date -> NOAA's flares of that day, None until retrieved: prevent multiple fetch
+        self.fig_title = {}    # file name -> file name w/o path and extension, for the status bar
         self.max_data = -1.0
         # prepare the GUI framework
         self.fig = Figure(facecolor='beige')
@@ -73,56 +87,218 @@ class Plot_Gui(ttk.Frame):
         self.toolbar.update()
         self.canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
-        # Add data to the graph for each file
-        for filename in sorted(file_list):
-            sid_file = SidFile(filename)
-            sid_file.XRAlist = []   # list will be populated if the user click on 'NOAA' button
-            self.sid_files.append(sid_file)
-            self.daysList[sid_file.startTime] = []
-            fig_title.append(os.path.basename(filename)[:-4])  # assumed extension .csv removed
-            for station in set(sid_file.stations) - self.hidden_stations:
-                self.max_data = max(self.max_data, max(self.sid_files[0].data[0]))
-                print(sid_file.startTime, station)
-                # Does this station already have a color? if not, reserve one
-                if station not in self.colorStation:
-                    self.colorStation[station] = color_list[color_idx % len(color_list)] + '-'  # format like 'b-'
-                    color_idx += 1
-                # Add points to the plot
-                self.graph.plot_date(sid_file.timestamp, sid_file.get_station_data(station), self.colorStation[station])
-        # add the buttons to show/add a station's curve
-        for s, c in self.colorStation.items():
-            btn_color = self.COLOR[c[0]]
-            station_button = tk.Button(self.tk_root, text=s,
-                                       bg=btn_color, activebackground="white")
-            station_button.configure(command=lambda s=s, b=station_button: self.on_click_station(s, b))
-            station_button.pack(side='left', padx=1, pady=1)
-
-        noaa_button = tk.Button(self.tk_root, text="NOAA", command=self.on_click_noaa)
-        noaa_button.pack(side='left', padx=1, pady=1)
+        # the buttons to show/add a station's curve are added before 'NOAA' when the station is found
+        self.noaa_button = tk.Button(self.tk_root, text="NOAA", command=self.on_click_noaa)
+        self.noaa_button.pack(side='left', padx=1, pady=1)
         # other GUI items
         self.statusbar_txt = tk.StringVar()
         self.label=tk.Label(self.tk_root,
                             bd=1, relief=tk.SUNKEN, #anchor=tk.W,
                             textvariable=self.statusbar_txt,
                             font=('arial', 10, 'normal'), pady=5)
-        self.statusbar_txt.set(", ".join(fig_title))
+        self.statusbar_txt.set("Reading %d file(s)..." % len(file_list))
         self.label.pack(fill=tk.X)
 
-        self.calc_ephem()  # calculate the sun rise/set for each file
+        self.canvas.mpl_connect('draw_event', self.on_draw)
         self.show_figure() # add other niceties and show the plot
 
+        # Read the files in the background: results handed to the Tk thread by poll_jobs()
+        self.nb_files = len(file_list)
+        self.nb_reading = len(file_list)
+        self.executor = ThreadPoolExecutor(max_workers=self.NB_WORKERS)
+        self.jobs = []          # (future, callback called in the Tk thread with the future's result)
+        self.file_locks = {}    # file name -> lock serializing the jobs sharing its lazy SidFile
+        self.poll_job = None    # Tk 'after' job of poll_jobs(), only while some jobs are running
+        self.closing = False
+        self.tk_root.protocol("WM_DELETE_WINDOW", self.on_close)
+        nb_pixels = self.nb_pixels()
+        for filename in sorted(file_list):
+            self.submit(self.on_file_read, self.read_file, filename, nb_pixels)
+        # zoom and pan: the visible range is drawn again at its level of detail
+        self.view_version = 0   # incremented at each new visible range, older results are dropped
+        self.detail_job = None  # Tk 'after' job waiting for the zoom/pan to stop
+        self.detail_futures = []  # jobs reading the details of the current visible range
+        self.zoomed_while_reading = False  # zoom/pan done while the files were read: details read once all read
+        self.graph.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def submit(self, callback, function, *args):
+        """Run function(*args) in the background, then callback(result) in the Tk thread. Return the future."""
+        future = self.executor.submit(function, *args)
+        self.jobs.append((future, callback))
+        if self.poll_job is None:
+            self.poll_job = self.tk_root.after(self.POLL_DELAY, self.poll_jobs)
+        return future
+
+    def poll_jobs(self):
+        """Tk thread: hand the results of the background jobs to their callbacks as soon as they are done.
+        Polls again only while some jobs are running."""
+        self.poll_job = None
+        for job in [job for job in self.jobs if job[0].done()]:
+            self.jobs.remove(job)
+            future, callback = job
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except (Exception, SystemExit) as err:  # SidFile may exit: keep going with the other files
+                print("Warning:", err)
+                result = None
+            callback(result)
+        if self.jobs and self.poll_job is None and not self.closing:
+            self.poll_job = self.tk_root.after(self.POLL_DELAY, self.poll_jobs)
+
+    def on_close(self):
+        """Window closed: drop the jobs not started, do not wait for the running ones"""
+        self.closing = True
+        for job in (self.poll_job, self.detail_job):
+            if job:
+                self.tk_root.after_cancel(job)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.tk_root.destroy()
+
+    def read_file(self, filename, nb_pixels):
+        """Background thread: read the file and return (file name, SidFile, {station: (x, y)}) decimated to nb_pixels"""
+        sid_file = SidFile(filename, lazy=True)  # the data are not read if the pyramid's sidecar is enough
+        if sid_file.is_live:  # live buffer: only the readings already written
+            sid_file = sid_file.live_view()
+        sid_file.XRAlist = []   # list will be populated if the user click on 'NOAA' button
+        curves = {station: self.plot_series(sid_file, station, nb_pixels) for station in sid_file.stations}
+        self.calc_ephem(sid_file)  # calculate the sun rise/set
+        return filename, sid_file, curves
+
+    def on_file_read(self, result):
+        """Tk thread: add the curves of a file read in the background and draw them"""
+        self.nb_reading -= 1
+        if result is not None:
+            filename, sid_file, curves = result
+            self.sid_files.append(sid_file)
+            self.file_locks[filename] = threading.Lock()
+            self.daysList.setdefault(sid_file.startTime, None)
+            self.fig_title[filename] = split_sid_extension(os.path.basename(filename))[0]  # extension .csv, .csv.gz or .sidb removed
+            for station, (x, y) in curves.items():
+                print(sid_file.startTime, station)
+                # Does this station already have a color? if not, reserve one
+                if station not in self.colorStation:
+                    self.add_station(station)
+                # Add points to the plot: animated curves drawn over the background by blitting
+                if len(y):
+                    self.max_data = max(self.max_data, numpy.nanmax(y))
+                line, = self.graph.plot(x, y, self.colorStation[station], animated=True)
+                line.set_visible(station not in self.hidden_stations)
+                self.lines[(filename, station)] = line
+            self.draw_night(sid_file, max([x[-1] for x, y in curves.values() if len(x)] or [sid_file.startTime]))
+            if self.noaa_active:
+                self.show_flares(sid_file)
+        titles = ", ".join(self.fig_title[filename] for filename in sorted(self.fig_title))
+        if self.nb_reading:
+            titles = "Reading %d/%d file(s)... %s" % (self.nb_files - self.nb_reading, self.nb_files, titles)
+        self.statusbar_txt.set(titles)
+        self.graph.tick_params(axis='x', which='minor', labelsize=12 if len(self.daysList.keys()) <= 1 else 8)
+        self.canvas.draw_idle()  # the axes limits change: full draw
+        if not self.nb_reading and self.zoomed_while_reading:
+            self.zoomed_while_reading = False
+            self.on_xlim_changed(self.graph)
+
+    def add_station(self, station):
+        """Reserve a color for the station and add its button to show/hide its curves"""
+        color_list = "".join(self.COLOR) # one color per station
+        self.colorStation[station] = color_list[self.color_idx % len(color_list)] + '-'  # format like 'b-'
+        self.color_idx += 1
+        btn_color = self.COLOR[self.colorStation[station][0]]
+        station_button = tk.Button(self.tk_root, text=station,
+                                   bg=btn_color, activebackground="white")
+        station_button.configure(command=lambda s=station, b=station_button: self.on_click_station(s, b))
+        station_button.pack(side='left', padx=1, pady=1, before=self.noaa_button)
+
+    def on_xlim_changed(self, axes):
+        """Zoom or pan: once the visible range stops moving, draw it again at its level of detail"""
+        if self.nb_reading:  # the range changes as the files are read: a zoom/pan waits for the last file
+            if not self.graph.get_autoscalex_on():  # set by the user, not by the curves added
+                self.zoomed_while_reading = True
+            return
+        if self.detail_job:
+            self.tk_root.after_cancel(self.detail_job)
+        self.detail_job = self.tk_root.after(self.DETAIL_DELAY, self.update_details)
+
+    def update_details(self):
+        """Read again the curves of the files visible in the new range, with one point per pixel"""
+        self.detail_job = None
+        self.view_version += 1
+        for future in self.detail_futures:  # the previous range is not drawn any more: skip its jobs not started
+            future.cancel()
+        start, end = [numpy.datetime64(matplotlib.dates.num2date(x).replace(tzinfo=None), 'us')
+                      for x in self.graph.get_xlim()]
+        width = self.graph.get_window_extent().width  # pixels of the graph
+        self.detail_futures = [self.submit(self.on_details_read, self.read_details, sid_file, start, end, width,
+                                           self.view_version)
+                               for sid_file in self.sid_files]
+
+    def read_details(self, sid_file, start, end, width, view_version):
+        """Background thread: return (view_version, file name, {station: (x, y)}) of the file's readings
+        between start and end, decimated to the pixels they take ; None if the file is not visible.
+        Coarse aggregates of the pyramid when zoomed out, the readings themselves when zoomed in."""
+        file_start = numpy.datetime64(sid_file.startTime, 'us')
+        file_end = file_start + numpy.timedelta64(1, 'D')
+        first, last = max(start, file_start), min(end, file_end)
+        if last <= first:
+            return None
+        nb_pixels = max(1, int(width * ((last - first) / (end - start))))
+        # the lazy SidFile (data read at first access, pyramid) is shared with the other jobs of the file
+        with self.file_locks[sid_file.filename]:
+            if first == file_start and last == file_end:   # the whole file: its pyramid or its cache
+                visible = sid_file
+            else:   # only the rows of the visible range are read
+                visible = sid_file.slice(first, last)
+            return view_version, sid_file.filename, \
+                   {station: self.plot_series(visible, station, nb_pixels) for station in sid_file.stations}
+
+    def on_details_read(self, result):
+        """Tk thread: replace the curves of a file by their details in the visible range"""
+        if result is None or result[0] != self.view_version:  # not visible or zoomed/panned since
+            return
+        view_version, filename, curves = result
+        for station, (x, y) in curves.items():
+            self.lines[(filename, station)].set_data(x, y)
+        self.blit()
+
     def on_click_noaa(self):
+        """Show or hide the flares of all the files, fetched from NOAA in the background the first time"""
+        self.noaa_active = not self.noaa_active
         for sid_file in self.sid_files:
-            if sid_file.XRAlist:
-                sid_file.XRAlist = []  # no longer to be displayed
-            elif self.daysList[sid_file.startTime]:
-                sid_file.XRAlist = self.daysList[sid_file.startTime]
+            if self.noaa_active:
+                self.show_flares(sid_file)
             else:
-                nf = NOAA_flares(sid_file.startTime)
-                nf.print_XRAlist()
-                self.daysList[sid_file.startTime] = nf.XRAlist
-                sid_file.XRAlist = self.daysList[sid_file.startTime]
-        self.update_graph()
+                for artist in self.flare_artists(sid_file.filename):
+                    artist.set_visible(False)
+        self.blit()
+
+    def show_flares(self, sid_file):
+        """Show the flares of the file, once the flares of its day are retrieved from NOAA"""
+        day = sid_file.startTime
+        if self.daysList.get(day) is None:
+            if day not in self.noaa_fetching:
+                self.noaa_fetching.add(day)
+                self.submit(lambda nf, day=day: self.on_flares_read(day, nf), NOAA_flares, day)
+            return
+        sid_file.XRAlist = self.daysList[day]
+        if sid_file.filename not in self.flares:
+            self.flares[sid_file.filename] = self.draw_flares(sid_file)
+        for artist in self.flare_artists(sid_file.filename):
+            artist.set_visible(True)
+
+    def on_flares_read(self, day, nf):
+        """Tk thread: keep the flares of the day retrieved from NOAA and show them on its files"""
+        self.noaa_fetching.discard(day)
+        if nf is None:  # NOAA not reachable: fetched again at the next click
+            self.statusbar_txt.set("Cannot retrieve the flares of %s from NOAA." % day.strftime("%Y-%m-%d"))
+            return
+        nf.print_XRAlist()
+        self.daysList[day] = nf.XRAlist
+        if self.noaa_active:
+            for sid_file in self.sid_files:
+                if sid_file.startTime == day:
+                    self.show_flares(sid_file)
+            self.blit()
 
     def on_click_station(self, station, button):
         """Invert the color of the button and hide/draw the corresponding graph"""
@@ -134,7 +310,10 @@ class Plot_Gui(ttk.Frame):
         else:
             self.hidden_stations.add(station)
             button.configure(bg="white", activebackground=alt_color)
-        self.update_graph()
+        for (filename, line_station), line in self.lines.items():
+            if line_station == station:
+                line.set_visible(station not in self.hidden_stations)
+        self.blit()
 
     def show_figure(self):
         # some cosmetics on the figure
@@ -146,69 +325,115 @@ class Plot_Gui(ttk.Frame):
         current_axes.set_xlabel("UTC Time")
         current_axes.set_ylabel("Signal Strength")
 
-        for label in current_axes.xaxis.get_majorticklabels():
-            label.set_fontsize(8)
-            label.set_rotation(30)  # 'vertical')
-            # label.set_horizontalalignment='left'
+        # the ticks are created as the files are read: set on the axis, not on the current labels
+        current_axes.tick_params(axis='x', which='major', labelsize=8, labelrotation=30)
+        current_axes.tick_params(axis='x', which='minor', labelsize=12 if len(self.daysList.keys()) <= 1 else 8)
 
-        for label in current_axes.xaxis.get_minorticklabels():
-            label.set_fontsize(12 if len(self.daysList.keys()) == 1 else 8)
+        self.canvas.draw()
 
-        # specific drawings for linked to each sid_file: flares and sunrise/sunset
-        bottom_max, top_max = current_axes.get_ylim()
-        for sid_file in self.sid_files:
-            # for each flare from NOAA, draw the lines and box with flares intensity
-            for eventName, BeginTime, MaxTime, EndTime, Particulars in sid_file.XRAlist:
-                self.graph.vlines([BeginTime, MaxTime, EndTime], 0, self.max_data,
-                           color=['g', 'r', 'y'], linestyles='dotted')
-                self.graph.text(MaxTime, self.max_data + (top_max - self.max_data) / 4.0,
-                                Particulars, horizontalalignment='center',
-                                bbox={'facecolor': 'w', 'alpha': 0.5, 'fill': True})
-            # draw the rectangles for rising and setting of the sun with astronomical twilight
-            if sid_file.rising < sid_file.setting:
-                self.graph.axvspan(sid_file.startTime, sid_file.rising.datetime(),
-                           facecolor='blue', alpha=0.1)
-                self.graph.axvspan(sid_file.setting.datetime(), max(sid_file.timestamp),
-                           facecolor='blue', alpha=0.1)
-            else:
-                self.graph.axvspan(sid_file.setting.datetime(), sid_file.rising.datetime(),
-                           facecolor='blue', alpha=0.1)
+    def draw_night(self, sid_file, end_time):
+        """Draw the rectangles for rising and setting of the sun with astronomical twilight"""
+        if sid_file.rising < sid_file.setting:
+            self.graph.axvspan(sid_file.startTime, sid_file.rising.datetime(),
+                       facecolor='blue', alpha=0.1)
+            self.graph.axvspan(sid_file.setting.datetime(), end_time,
+                       facecolor='blue', alpha=0.1)
+        else:
+            self.graph.axvspan(sid_file.setting.datetime(), sid_file.rising.datetime(),
+                       facecolor='blue', alpha=0.1)
 
-        self.canvas.draw()
+    def draw_flares(self, sid_file):
+        """Return the animated artists of the file's flares: for each flare from NOAA, the lines and box with its intensity.
+        Their height is set by place_flares() before each draw."""
+        flares = []
+        for eventName, BeginTime, MaxTime, EndTime, Particulars in sid_file.XRAlist:
+            lines = self.graph.vlines([BeginTime, MaxTime, EndTime], 0, 0,
+                                      color=['g', 'r', 'y'], linestyles='dotted', animated=True)
+            label = self.graph.text(MaxTime, 0, Particulars, horizontalalignment='center', animated=True,
+                                    bbox={'facecolor': 'w', 'alpha': 0.5, 'fill': True})
+            flares.append((lines, label))
+        return flares
 
-    def update_graph(self):
-        # Redraw the selected stations on a clear graph
-        self.fig.clear()
-        self.graph = self.fig.add_subplot(111)
-        for sid_file in self.sid_files:
-            for station in set(sid_file.stations) - self.hidden_stations:
-                print(sid_file.startTime, station)
-                # Add points to the plot
-                self.graph.plot_date(sid_file.timestamp, sid_file.get_station_data(station), self.colorStation[station])
-        self.show_figure()
+    def flare_artists(self, filename):
+        return [artist for flare in self.flares.get(filename, []) for artist in flare]
+
+    def place_flares(self):
+        """Lines up to the highest reading, labels above them: both follow the files read since and the zoom"""
+        bottom_max, top_max = self.graph.get_ylim()
+        max_data = max(self.max_data, 0)
+        for flares in self.flares.values():
+            for lines, label in flares:
+                segments = lines.get_segments()
+                for segment in segments:
+                    segment[:, 1] = (0, max_data)
+                lines.set_segments(segments)
+                label.set_y(max_data + (top_max - max_data) / 4.0)
+
+    def animated_artists(self):
+        return list(self.lines.values()) + [artist for filename in self.flares for artist in self.flare_artists(filename)]
+
+    def on_draw(self, event):
+        """After a full draw (resize, zoom, pan...): keep the new background then draw the curves and flares over it"""
+        if self.canvas.is_saving():  # saving draws the animated artists in the file
+            return
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
 
-    def calc_ephem(self):
+    def draw_animated(self):
+        self.place_flares()
+        for artist in self.animated_artists():
+            if artist.get_visible():
+                self.graph.draw_artist(artist)
+
+    def blit(self):
+        """Redraw only the curves and flares shown, over the saved background"""
+        if self.background is None:
+            self.canvas.draw()  # first draw: on_draw saves the background
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+        self.canvas.blit(self.fig.bbox)
+
+    def plot_series(self, sid_file, station, nb_pixels):
+        """Return the (x, y) curve of the station decimated to nb_pixels, from the cache if any"""
+        if self.cache:
+            return self.cache.cached_plot_series(sid_file, station, nb_pixels)
+        return plot_series(sid_file, station, nb_pixels)
+
+    def nb_pixels(self):
+        """Pixels available for one file across the graph: enough points to plot"""
+        width = self.fig.get_figwidth() * self.fig.dpi
+        return max(1, int(width / max(1, self.nb_files)))
+
+    def calc_ephem(self, sid_file):
         """
-            Compute the night period of each SidFile using the ephem module
+            Compute the night period of the SidFile using the ephem module
         """
         sid_loc = ephem.Observer()
-        for sid_file in self.sid_files:
-            sid_loc.lon, sid_loc.lat = sid_file.sid_params['longitude'], sid_file.sid_params['latitude']
-            sid_loc.date = sid_file.startTime
-            sid_loc.horizon = '-18'  # astronomical twilight
-            sid_file.rising = sid_loc.next_rising(ephem.Sun(), use_center=True)
-            sid_file.setting = sid_loc.next_setting(ephem.Sun(), use_center=True)
-            # print(sid_file.filename, sid_file.startTime)
-            # print(rising, ephem.localtime(rising))
-            # print(setting, ephem.localtime(setting))
+        sid_loc.lon, sid_loc.lat = sid_file.sid_params['longitude'], sid_file.sid_params['latitude']
+        sid_loc.date = sid_file.startTime
+        sid_loc.horizon = '-18'  # astronomical twilight
+        sid_file.rising = sid_loc.next_rising(ephem.Sun(), use_center=True)
+        sid_file.setting = sid_loc.next_setting(ephem.Sun(), use_center=True)
+        # print(sid_file.filename, sid_file.startTime)
+        # print(rising, ephem.localtime(rising))
+        # print(setting, ephem.localtime(setting))
 
 
 if __name__ == '__main__':
     filenames = ""
     parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--config", dest="cfg_filename", required=False, default='',
+                        help="SuperSID Configuration file, for its 'plot_cache' and 'plot_cache_size'")
+    parser.add_argument("--cache", dest="cache_path",
+                        help="Folder caching the decimated curves, default 'plot_cache' of the configuration file",
+                        metavar="FOLDER")
     (args, unk) = parser.parse_known_args()
     file_list = [os.path.expanduser(f) for f in unk]
+    config = Config(args.cfg_filename) if args.cfg_filename else {}
+    cache_path = args.cache_path or config.get("plot_cache", None)
+    cache = PlotCache(cache_path, config.get("plot_cache_size", 100) * 1024 * 1024) if cache_path else None
 
     root = tk.Tk()
-    Plot_Gui(root, file_list)
-    root.mainloop()
\ No newline at end of file
+    Plot_Gui(root, file_list, cache)
+    root.mainloop()
@@ -11,8 +11,6 @@
 """
 from __future__ import print_function   # use the new Python 3 'print' function
 import os.path
-# matplotlib ONLY used in Controller for its PSD function, not for any graphic
-from matplotlib.mlab import psd as mlab_psd
 from time import sleep
 import argparse
 
@@ -22,6 +20,7 @@ from sampler import Sampler
 from config import Config
 from logger import Logger
 from textsidviewer import textSidViewer
+from spectrum import SpectrumEngine
 
 class SuperSID_scanner():
     '''
@@ -68,7 +67,7 @@ class SuperSID_scanner():
         # Note: the list of Viewers can be extended provided they implement the same interface
         self.config['viewer'] = 'text'   # Lighter text version a.k.a. "console mode"
         self.viewer = textSidViewer(self)
-        self.psd = mlab_psd             # calculation only
+        self.psd = SpectrumEngine()     # calculation only
 
         # calculate Stations' buffer_size
         self.buffer_size = int(24*60*60 / self.config['log_interval'])
@@ -107,25 +106,23 @@ class SuperSID_scanner():
         message = "%s  [%d]  Capturing data..." % (self.timer.get_utc_now(), current_index)
         self.viewer.status_display(message, level=1)
 
+        signal_strengths = []
         try:
-            data = self.sampler.capture_1sec()  # return a list of 1 second signal strength
-            Pxx, freqs = self.psd(data, self.sampler.NFFT, self.sampler.audio_sampling_rate)
+            data = self.sampler.capture()  # return 1 second of signal, or 'log_interval' seconds in continuous mode
+            if len(data):  # else capture failed or sampler not ready: no reading for this tick
+                Pxx, freqs = self.psd(data, self.sampler.NFFT, self.sampler.audio_sampling_rate)
+                for binSample in self.sampler.monitored_bins:
+                    signal_strengths.append(Pxx[binSample])
         except IndexError as idxerr:
             print("Index Error:", idxerr)
             print("Data len:", len(data))
 
-        signal_strengths = []
-        for binSample in self.sampler.monitored_bins:
-            signal_strengths.append(Pxx[binSample])
-
         # ensure that one thread at the time accesses the sid_file's' buffers
         with self.timer.lock:
-            # Save signal strengths into memory buffers ; prepare message for status bar
+            # Save signal strengths into memory buffers, filtered buffers follow ; prepare message for status bar
+            self.logger.sid_file.record_tick(current_index, utc_now, signal_strengths)
             message = self.timer.get_utc_now() + "  [%d]  " % current_index
             message += "%d" % (self.scan_end_time - self.timer.time_now)
-            for station, strength in zip(self.config.stations, signal_strengths):
-                station['raw_buffer'][current_index] = strength
-            self.logger.sid_file.timestamp[current_index] = utc_now
 
             # did we complete the expected scanning duration?
             if self.timer.time_now >= self.scan_end_time:
@@ -55,6 +55,7 @@ class textSidViewer:
         print (" E) save Extended raw buffers")
         print ("-" * self.MAXLINE)
         print (" C) list the Config file(s) parameters")
+        print (" T) Timer statistics")
         print (" V) Version")
         print (" ?) display this menu")
         print (" X) eXit (without saving)")
@@ -77,6 +78,10 @@ class textSidViewer:
             for key in sorted(self.controller.config.keys()):
                 print ("\t%s = %s" % (key, str(self.controller.config[key])))
             print ("Stations:", self.controller.config.stations)
+        elif s == 't':
+            print ("\n")
+            for key, value in sorted(self.controller.timer.get_stats().items()):
+                print ("\t%s = %s" % (key, value))
         elif s == 'v':
             print ("\n")
             try:
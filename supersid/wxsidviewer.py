@@ -144,9 +144,12 @@ class wxSidViewer(wx.Frame):
             self.Close(True)
 
     def on_plot(self, event):
-        """Save current buffers (raw) and display the data using supersid_plot.
+        """Save current buffers (raw), or read the live buffer if shared, and display the data using supersid_plot.
         Using a separate process to prevent interference with data capture"""
-        filenames = self.controller.save_current_buffers(log_format = 'supersid_format')
+        if self.controller.logger.sid_file.live_filename:
+            filenames = [self.controller.logger.sid_file.live_filename]
+        else:
+            filenames = self.controller.save_current_buffers(log_format = 'supersid_format')
         print("plotting", filenames)
         SSP.do_main(filenames)
         